@@ -1,56 +1,255 @@
-import google.generativeai as genai
+import hashlib
+import io
 import json
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from types import SimpleNamespace
+import pandas as pd
 import streamlit as st
+import metrics
+from money_words import read_money
+
+def _genai():
+    # SDK nặng (grpc, protobuf...): chỉ import khi thực sự gọi AI, không làm chậm lúc mở app
+    import google.generativeai as genai
+    return genai
+
 def configure_genai():
     try:
         api_key = st.secrets["GOOGLE_API_KEY"]
-        genai.configure(api_key=api_key)
+        _genai().configure(api_key=api_key)
         return True
     except Exception as e:
         st.error(f"Lỗi API Key: {e}.")
         return False
     
-def ask_ai_to_parse(csv_data):
-    model = genai.GenerativeModel('gemini-2.5-pro')
-    prompt = f"""
+# parse theo chunk: chia file thành nhiều đoạn vừa ngân sách token, gọi song song,
+# kết quả cache theo hash từng dòng nên phân tích lại file cũ / sao kê trùng không tốn thêm lượt gọi
+PARSE_MODEL = 'gemini-2.5-pro'
+CHUNK_TOKEN_BUDGET = 6000  # ước lượng ~4 ký tự / token
+MAX_WORKERS = 4
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0  # giây, nhân đôi sau mỗi lần thử
+ROW_CACHE_SIZE = 100_000
+
+PARSE_PROMPT = """
     Bạn là một trợ lý kế toán chuyên nghiệp. Tôi có một đoạn dữ liệu giao dịch dưới dạng CSV thô.
     Nhiệm vụ của bạn:
     1. Trích xuất: Người giao dịch, Nội dung khoản tiền, Khoản tiền, Phân loại danh mục, Ngày Giao dịch, Loại tương ứng với các cột user,content,amount,category,date,type
     2. Phân loại: Tự động chọn danh mục cho mỗi khoản chi dựa trên dữ liệu đọc (chỉ chọn trong: "Ăn uống", "Di chuyển", "Nhà cửa", "Giải trí", "Khác").
     3. Chú ý: Cột loại chỉ nhận 2 giá trị là "Thu nhập" và "Chi tiêu"
     4. Định dạng: Trả về kết quả dưới dạng JSON List.
+    5. Mỗi phần tử phải có thêm trường "row" bằng đúng giá trị cột row của dòng CSV tạo ra nó.
     Lưu ý:
     - Nếu số tiền là số âm, hãy chuyển thành số dương.
     - Định dạng ngày trả về: YYYY-MM-DD.
     - Không giải thích thêm, chỉ trả về JSON.
     Dữ liệu CSV:
-    {csv_data}
+{csv_data}
     """
-    
-    try:
-        response = model.generate_content(prompt)
-        text_response = response.text.replace("```json", "").replace("```", "").strip()
-        return json.loads(text_response)
-    except Exception as e:
-        print(f"AI Error: {e}")
+
+_row_cache = OrderedDict()
+_row_cache_lock = threading.Lock()
+
+def _cache_get(key):
+    with _row_cache_lock:
+        if key in _row_cache:
+            _row_cache.move_to_end(key)
+            return _row_cache[key]
+    return None
+
+def _cache_put(key, items):
+    with _row_cache_lock:
+        _row_cache[key] = items
+        _row_cache.move_to_end(key)
+        while len(_row_cache) > ROW_CACHE_SIZE:
+            _row_cache.popitem(last=False)
+
+def _row_keys(df, model_name):
+    # key = (model, header, hash nội dung dòng); hash theo text để cùng 1 dòng ở 2 file khác dtype vẫn trùng
+    texts = df.iloc[:, 0].astype(str)
+    for col in range(1, df.shape[1]):
+        texts = texts + '\x1f' + df.iloc[:, col].astype(str)
+    header = hashlib.sha1('\x1f'.join([model_name, *map(str, df.columns)]).encode()).hexdigest()
+    return [(header, int(h)) for h in pd.util.hash_pandas_object(texts, index=False)], texts
+
+def _split_chunks(positions, texts, budget):
+    # gom các dòng liên tiếp sao cho tổng token ước lượng không vượt budget
+    tokens = (texts.str.len() // 4 + 1).cumsum()
+    chunk_ids = (tokens - 1) // budget
+    return [group.tolist() for _, group in pd.Series(positions, index=chunk_ids.index).groupby(chunk_ids.values)]
+
+def iter_json_objects(pieces):
+    # parser JSON tăng dần cho response dạng [ {...}, {...} ] (có thể kèm ```json):
+    # nhận từng mảnh text, yield mỗi object cấp ngoài cùng ngay khi đóng ngoặc.
+    # Object hỏng bị bỏ qua; response bị cắt giữa chừng vẫn giữ các object đã đủ.
+    buffer, start, depth, in_string, escape = '', 0, 0, False, False
+    for piece in pieces:
+        offset = len(buffer)
+        buffer += piece
+        for i in range(offset, len(buffer)):
+            ch = buffer[i]
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == '\\':
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = depth > 0
+            elif ch == '{':
+                if depth == 0:
+                    start = i
+                depth += 1
+            elif ch == '}' and depth:
+                depth -= 1
+                if depth == 0:
+                    try:
+                        yield json.loads(buffer[start:i + 1])
+                    except ValueError as e:
+                        print(f"AI Error: bỏ qua object lỗi: {e}")
+        # chỉ giữ lại phần object đang mở
+        buffer = buffer[start:] if depth else ''
+        start = 0
+
+def _stream_chunk(model, csv_chunk, emit):
+    # trả về True nếu chunk chạy hết; lỗi sau khi đã có kết quả thì giữ phần đã nhận và trả về False,
+    # caller gửi lại riêng các dòng chưa có kết quả
+    last_error = None
+    for attempt in range(MAX_RETRIES):
+        received = 0
+        try:
+            response = model.generate_content(PARSE_PROMPT.format(csv_data=csv_chunk), stream=True)
+            for item in iter_json_objects(part.text for part in response):
+                received += 1
+                emit(item)
+            return True
+        except Exception as e:
+            last_error = e
+            if received:
+                break
+            if attempt < MAX_RETRIES - 1:
+                time.sleep(RETRY_BACKOFF * 2 ** attempt * (1 + random.random()))
+    print(f"AI Error: {last_error}")
+    return False
+
+def _iter_parse(df, model):
+    # yield (vị trí dòng gốc, giao dịch): dòng đã cache trước, sau đó theo thứ tự AI trả về
+    model = model or _genai().GenerativeModel(PARSE_MODEL)
+    keys, texts = _row_keys(df, getattr(model, 'model_name', PARSE_MODEL))
+    missing = []
+    for pos, key in enumerate(keys):
+        items = _cache_get(key)
+        if items is None:
+            missing.append(pos)
+        else:
+            for item in items:
+                yield pos, dict(item)
+    metrics.incr('ai_row_cache', result='hit', n=len(keys) - len(missing))
+    metrics.incr('ai_row_cache', result='miss', n=len(missing))
+    if not missing:
+        return
+
+    frame = df.reset_index(drop=True)
+    results = queue.Queue()
+
+    def run(rows):
+        found = {pos: [] for pos in rows}
+        cacheable = True
+        def emit(item):
+            nonlocal cacheable
+            pos = item.pop('row', None)
+            try:
+                pos = int(pos)
+            except (TypeError, ValueError):
+                pos = None
+            if pos not in found:
+                # không xác định được dòng gốc: gắn vào đầu chunk, không cache chunk này
+                pos, cacheable = rows[0], False
+            found[pos].append(item)
+            results.put((pos, dict(item)))
+        pending = rows
+        with metrics.timed('ai.parse_chunk', model=getattr(model, 'model_name', PARSE_MODEL)) as timer:
+            for _ in range(MAX_RETRIES):
+                csv_chunk = frame.iloc[pending].rename_axis('row').reset_index().to_csv(index=False)
+                complete = _stream_chunk(model, csv_chunk, emit)
+                # response bị cắt giữa chừng: giữ các dòng đã nhận, gửi lại các dòng chưa có kết quả
+                pending = [pos for pos in pending if not found[pos]]
+                if complete or not pending:
+                    break
+            timer.rows = sum(len(row_items) for row_items in found.values())
+        if pending and not complete:
+            metrics.incr('ai_rows_failed', n=len(pending))
+        if complete and cacheable:
+            for pos, row_items in found.items():
+                _cache_put(keys[pos], row_items)
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = [pool.submit(run, rows) for rows in _split_chunks(missing, texts.iloc[missing], CHUNK_TOKEN_BUDGET)]
+        while True:
+            try:
+                yield results.get(timeout=0.05)
+            except queue.Empty:
+                if all(future.done() for future in futures):
+                    break
+        while not results.empty():
+            yield results.get_nowait()
+        for future in futures:
+            if future.exception():
+                print(f"AI Error: {future.exception()}")
+
+def _as_frame(data):
+    return pd.read_csv(io.StringIO(data)) if isinstance(data, str) else data
+
+def ask_ai_to_parse_stream(data, model=None):
+    # như ask_ai_to_parse nhưng yield từng giao dịch (kèm 'row' = index dòng gốc) ngay khi parse xong
+    df = _as_frame(data)
+    if df.empty:
+        return
+    for pos, item in _iter_parse(df, model):
+        yield dict(item, row=df.index[pos])
+
+def ask_ai_to_parse(data, model=None, keep_row=False):
+    # data: DataFrame (hoặc chuỗi CSV như trước); model: mặc định Gemini, truyền StubModel() để chạy offline
+    # keep_row=True: mỗi kết quả có thêm 'row' = index của dòng gốc trong data (dòng không có 'row' nào = AI không trả kết quả)
+    df = _as_frame(data)
+    if df.empty:
         return []
-def ask_ai_to_read_money(amount):
-    model=genai.GenerativeModel('gemini-2.5-flash')
-    prompt = f"""
-    Bạn là một công cụ chuyển đổi số liệu thành văn bản tiếng Việt chuẩn. Nhiệm vụ của bạn là nhận vào một chuỗi số và trả về cách đọc của số đó bằng tiếng Việt.
-    Quy tắc:
+    # ghép theo đúng thứ tự dòng gốc (sort ổn định, giữ thứ tự giao dịch trong cùng 1 dòng)
+    ordered = sorted(_iter_parse(df, model), key=lambda pair: pair[0])
+    return [dict(item, row=df.index[pos]) if keep_row else item for pos, item in ordered]
 
-    Chỉ trả về văn bản cách đọc số, không được thêm bất kỳ lời dẫn hay giải thích nào (như "Đây là cách đọc...").
+class StubModel:
+    # model giả để chạy/test offline: mỗi dòng CSV -> 1 giao dịch, lấy cột số đầu tiên làm số tiền
+    model_name = 'stub'
 
-    Đọc đúng chuẩn ngữ pháp tiếng Việt (ví dụ: dùng "lẻ" hoặc "linh" cho số 0 ở giữa, "mốt" cho số 1 tận cùng hàng chục, "tư" cho số 4, v.v.).
+    def generate_content(self, prompt, stream=False):
+        df = pd.read_csv(io.StringIO(prompt.split("Dữ liệu CSV:\n", 1)[1]))
+        items = []
+        for record in df.to_dict('records'):
+            values = [v for k, v in record.items() if k != 'row']
+            numbers = [v for v in values if isinstance(v, (int, float)) and not pd.isna(v)]
+            texts = [str(v) for v in values if isinstance(v, str)]
+            amount = numbers[0] if numbers else 0
+            items.append({
+                'row': record['row'], 'user': '', 'content': texts[0] if texts else '',
+                'amount': abs(amount), 'category': 'Khác', 'date': str(date.today()),
+                'type': 'Chi tiêu' if amount <= 0 else 'Thu nhập',
+            })
+        text = json.dumps(items, ensure_ascii=False)
+        if stream:
+            return [SimpleNamespace(text=text[i:i + 64]) for i in range(0, len(text), 64)]
+        return SimpleNamespace(text=text)
 
-    Nếu số quá lớn, hãy đọc theo lớp (tỷ, triệu, nghìn).
-    Đây là số bạn cần đọc:
-    {amount}
-    """
+def ask_ai_to_read_money(amount):
+    # đọc số bằng bộ chuyển đổi cục bộ (money_words), không gọi AI; giữ tên hàm cho code cũ
     try:
-        response= model.generate_content(prompt)
-        text_response = response.text.strip()
-        return text_response
-    except Exception as e:
-        return []
\ No newline at end of file
+        return read_money(amount)
+    except ValueError:
+        return []
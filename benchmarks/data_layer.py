@@ -0,0 +1,137 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_service as ai
+import cache
+import repository
+import report
+from datagen import PASSWORD, STATEMENT_COLUMNS, generate, make_statement, make_transactions
+
+# Micro-benchmark từng hàm của repository (và parse AI với StubModel, không cần mạng) trên DB sinh bởi datagen.py.
+# Mặc định --cache none: đo chi phí DB thật; --cache memory: đo đường cache hit như app chạy lâu.
+# python benchmarks/data_layer.py --users 20 --rows 5000 --repeat 50 --save benchmarks/results/data_layer.json
+# python benchmarks/data_layer.py --baseline benchmarks/results/data_layer.json   (mã 1 nếu chậm hơn quá --max-regression)
+
+FILTERS = {'date_from': '2022-01-01', 'date_to': '2023-12-31', 'categories': ('Ăn uống', 'Di chuyển'),
+           'amount_min': 10000, 'amount_max': None}
+NO_FILTERS = {'date_from': None, 'date_to': None, 'categories': (), 'amount_min': None, 'amount_max': None}
+BULK_ROWS = 500
+STATEMENT_ROWS = 2000
+AI_ROWS = 50
+
+
+def prepare_deletes(owner, repeat):
+    # mỗi lần đo xóa 1 nhóm riêng (danh mục 'Xóa ...'), không đụng vào dữ liệu các phép đo khác
+    rows = pd.DataFrame({
+        'ten': [f"Xóa {i}" for i in range(repeat * 2)], 'so_tien': 1000.0, 'ngay': '2024-01-01',
+        'danh_muc': [f"Xóa id {i}" for i in range(repeat)] + [f"Xóa lọc {i}" for i in range(repeat)],
+    })
+    repository.add_expenses_bulk(owner, rows)
+    ids = repository.get_data_with_id('expenses', owner)
+    ids = ids[ids['category'].astype(str).str.startswith('Xóa id ')]
+    return ids.groupby(ids['category'].astype(str))['id'].apply(list).to_dict()
+
+
+def build_cases(users, repeat, rng):
+    # (tên, hàm không tham số); hàm đọc chọn user ngẫu nhiên mỗi lần gọi
+    pick = lambda: rng.choice(users)
+    counter = itertools.count()
+    writer_user = users[0]
+    delete_ids = prepare_deletes(writer_user, repeat)
+    delete_ids_n, delete_where_n = itertools.count(), itertools.count()
+
+    def update():
+        page, _ = repository.get_page('expenses', writer_user, NO_FILTERS)
+        edited = page.copy()
+        edited.loc[edited.index[:10], 'amount'] += 1000
+        repository.update_records('expenses', writer_user, edited, page)
+
+    def statement():
+        f = make_statement(STATEMENT_ROWS, rng, tag=f" #{next(counter)}")
+        repository.add_records_from_file('expenses', pick(), f, STATEMENT_COLUMNS)
+
+    def ai_parse():
+        # tên mới mỗi lần để không trúng cache dòng của ai_service
+        df = make_transactions(AI_ROWS, rng, tag=f" #{next(counter)}")[['ngay', 'ten', 'so_tien']]
+        repository.add_transactions_bulk(pick(), pd.DataFrame(ai.ask_ai_to_parse(df, model=ai.StubModel())).rename(
+            columns={'content': 'ten', 'amount': 'so_tien', 'category': 'danh_muc', 'date': 'ngay', 'type': 'loai'}))
+
+    history = make_transactions(200, random.Random(1))
+    return [
+        ('login_user', lambda: repository.login_user(pick(), PASSWORD)),
+        ('get_data_version', lambda: repository.get_data_version(pick())),
+        ('get_totals', lambda: repository.get_totals(pick())),
+        ('get_category_sums', lambda: repository.get_category_sums('expenses', pick())),
+        ('get_monthly_sums', lambda: repository.get_monthly_sums('expenses', pick())),
+        ('view_expenses', lambda: repository.view_expenses(pick())),
+        ('view_income', lambda: repository.view_income(pick())),
+        ('get_data_with_id', lambda: repository.get_data_with_id('expenses', pick())),
+        ('get_page', lambda: repository.get_page('expenses', pick(), NO_FILTERS)),
+        ('get_page[filters]', lambda: repository.get_page('expenses', pick(), FILTERS)),
+        ('get_filtered_summary', lambda: repository.get_filtered_summary('expenses', pick(), FILTERS)),
+        ('get_ledger', lambda: repository.get_ledger(pick())),
+        ('get_ledger[date_from]', lambda: repository.get_ledger(pick(), date_from='2023-01-01')),
+        ('search_transactions', lambda: repository.search_transactions(pick(), rng.choice(['pho', 'grab', 'tien dien', 'luong']))),
+        ('iter_records', lambda: sum(len(chunk) for chunk in repository.iter_records('expenses', pick()))),
+        ('verify_rollups', lambda: repository.verify_rollups(pick())),
+        ('classify_names', lambda: repository.classify_names(pick(), history['ten'].tolist())),
+        ('label_from_history', lambda: repository.label_from_history(pick(), history, 'ten', 'so_tien', 'ngay')),
+        ('add_expense', lambda: repository.add_expense(pick(), 'Phở bò', 50000, 'Ăn uống', '2024-01-02')),
+        ('add_income', lambda: repository.add_income(pick(), 'Lương tháng', 15000000, 'Lương', '2024-01-05')),
+        ('add_transactions_bulk', lambda: repository.add_transactions_bulk(pick(), make_transactions(BULK_ROWS, rng, tag=f" #{next(counter)}"))),
+        ('add_records_from_file', statement),
+        ('update_records', update),
+        ('del_records', lambda: repository.del_records('expenses', delete_ids[f"Xóa id {next(delete_ids_n)}"], writer_user)),
+        ('del_records_where', lambda: repository.del_records_where(
+            'expenses', writer_user, dict(NO_FILTERS, categories=(f"Xóa lọc {next(delete_where_n)}",)))),
+        ('ai.ask_ai_to_parse[stub]', ai_parse),
+    ]
+
+
+def run_case(fn, repeat, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--cache', choices=['none', 'memory'], default='none')
+    parser.add_argument('--only', help="chỉ chạy các phép đo có tên chứa chuỗi này")
+    parser.add_argument('--seed', type=int, default=0)
+    report.add_arguments(parser)
+    args = parser.parse_args()
+
+    cache.set_backend(cache.NullCache() if args.cache == 'none' else cache.MemoryCache())
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        users = generate(os.path.join(tmp, 'bench.db'), args.users, args.rows, args.seed)
+        print(f"Sinh dữ liệu {args.users} x {args.rows}: {time.perf_counter() - start:.1f} s")
+        rng = random.Random(args.seed)
+        # mỗi lần đo xóa dùng 1 nhóm riêng: cần đủ nhóm cho cả warmup
+        results = {}
+        for name, fn in build_cases(users, args.repeat + args.warmup, rng):
+            if args.only and args.only not in name:
+                continue
+            results[name] = report.summarize(run_case(fn, args.repeat, args.warmup))
+        repository.get_writer().close()
+    sys.exit(report.finish(results, args, benchmark='data_layer', users=args.users, rows=args.rows,
+                           repeat=args.repeat, cache=args.cache))
@@ -0,0 +1,107 @@
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import repository
+
+# Sinh dữ liệu giả cho benchmark: N user x M giao dịch, ghi qua repository (trigger rollup/FTS, content_hash
+# và classifier chạy như dữ liệu thật). Cùng --seed thì ra cùng dữ liệu.
+# python benchmarks/datagen.py --db bench.db --users 20 --rows 5000
+PASSWORD = 'bench'
+EXPENSE_NAMES = {
+    'Ăn uống': ['Phở bò', 'Bún chả', 'Cà phê sữa đá', 'Cơm tấm', 'Trà sữa', 'Bánh mì', 'Đi chợ', 'Lẩu'],
+    'Di chuyển': ['Grab', 'Xăng xe', 'Gửi xe', 'Vé xe buýt', 'Taxi sân bay', 'Rửa xe'],
+    'Nhà cửa': ['Tiền điện', 'Tiền nước', 'Internet', 'Tiền nhà', 'Sửa điều hòa'],
+    'Giải trí': ['Xem phim', 'Netflix', 'Karaoke', 'Du lịch Đà Lạt', 'Mua sách'],
+    'Khác': ['Quà sinh nhật', 'Khám bệnh', 'Cắt tóc', 'Từ thiện'],
+}
+INCOME_NAMES = {
+    'Lương': ['Lương tháng', 'Thưởng dự án'],
+    'Hoa Hồng': ['Hoa hồng bán hàng'],
+    'Nghề tay trái': ['Dạy thêm', 'Bán đồ cũ', 'Freelance'],
+    'Khác': ['Lãi tiết kiệm', 'Hoàn tiền'],
+}
+INCOME_SHARE = 0.15
+START_DATE = date(2020, 1, 1)
+DAYS = 5 * 365
+
+
+def username(n):
+    return f"user{n:04d}"
+
+
+def make_transactions(rows, rng, tag=''):
+    # DataFrame đúng dạng add_transactions_bulk: ten, so_tien, danh_muc, ngay, loai
+    # tag: thêm vào tên để các lần gọi khác nhau không bị content_hash coi là trùng
+    records = []
+    for _ in range(rows):
+        income = rng.random() < INCOME_SHARE
+        names = INCOME_NAMES if income else EXPENSE_NAMES
+        category = rng.choice(list(names))
+        amount = rng.randrange(1, 2000) * 1000 if not income else rng.randrange(500, 30000) * 1000
+        records.append({
+            'ten': f"{rng.choice(names[category])}{tag} {rng.randrange(100)}",
+            'so_tien': float(amount),
+            'danh_muc': category,
+            'ngay': (START_DATE + timedelta(days=rng.randrange(DAYS))).isoformat(),
+            'loai': 'Thu nhập' if income else 'Chi tiêu',
+        })
+    return pd.DataFrame(records, columns=['ten', 'so_tien', 'danh_muc', 'ngay', 'loai'])
+
+
+STATEMENT_COLUMNS = {'ten': 'Nội dung', 'so_tien': 'Số tiền', 'danh_muc': 'Danh mục', 'ngay': 'Ngày'}
+
+
+def make_statement(rows, rng, tag=''):
+    # file sao kê CSV kiểu ngân hàng VN ("1.234.000 đ", dd/mm/yyyy) như người dùng upload;
+    # trả về file trong RAM có .name giống UploadedFile, dùng với add_records_from_file(..., STATEMENT_COLUMNS)
+    df = make_transactions(rows, rng, tag)
+    df = df[df['loai'] == 'Chi tiêu']
+    statement = pd.DataFrame({
+        'Ngày': pd.to_datetime(df['ngay']).dt.strftime('%d/%m/%Y'),
+        'Nội dung': df['ten'],
+        'Số tiền': df['so_tien'].map(lambda v: f"{v:,.0f} đ".replace(',', '.')),
+        'Danh mục': df['danh_muc'],
+    })
+    f = io.BytesIO(statement.to_csv(index=False).encode('utf-8'))
+    f.name = 'sao_ke.csv'
+    return f
+
+
+def generate(path, users, rows, seed=0):
+    # tạo DB mới ở path (repository.DB_PATH trỏ vào đây), trả về danh sách username
+    repository.DB_PATH = path
+    repository.init_db()
+    rng = random.Random(seed)
+    names = [username(n) for n in range(users)]
+    for name in names:
+        repository.create_user(name, PASSWORD)
+        inserted, skipped, errors = repository.add_transactions_bulk(name, make_transactions(rows, rng))
+        if not errors.empty:
+            raise RuntimeError(f"dữ liệu sinh ra bị lỗi: {errors.head()}")
+    return names
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        sys.exit(f"{args.db} đã tồn tại")
+    start = time.perf_counter()
+    generate(args.db, args.users, args.rows, args.seed)
+    repository.get_writer().close()
+    print(f"Đã tạo {args.users} user x {args.rows} giao dịch trong {time.perf_counter() - start:.1f} s "
+          f"(mật khẩu: {PASSWORD})")
@@ -0,0 +1,59 @@
+import argparse
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import repository
+from db_writer import DbWriter
+
+# Bộ nhớ frame mà st.cache_data giữ cho 1 user: read_sql_query mặc định vs _compact_frame
+# cache_data lưu bản pickle và unpickle ra bản copy mỗi lần hit -> đo cả 2
+# python benchmarks/frame_memory.py --rows 1000000 --categories 30
+QUERY = "SELECT item_name as ten, category as danh_muc, date as ngay, amount as so_tien FROM expenses WHERE owner=?"
+
+
+def seed(path, rows, categories):
+    writer = DbWriter(path)
+    writer.run(repository.migrate)
+    def write(c):
+        # insert thẳng, không qua classifier (không đo ở đây)
+        c.executemany("INSERT INTO expenses(owner, item_name, amount, category, date) VALUES (?,?,?,?,?)",
+                      (("user0", f"Giao dịch {i % 5000}", float(i % 2000 * 1000), f"Danh mục {i % categories}",
+                        f"{2015 + i % 10}-{i % 12 + 1:02d}-{i % 28 + 1:02d}") for i in range(rows)))
+    writer.run(write)
+    writer.close()
+
+
+def measure(name, load, conn):
+    start = time.perf_counter()
+    df = load(conn)
+    elapsed = time.perf_counter() - start
+    pickled = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+    start = time.perf_counter()
+    pickle.loads(pickled)
+    hit = time.perf_counter() - start
+    print(f"{name:>10} {df.memory_usage(deep=True).sum() / 2 ** 20:>12.1f} {len(pickled) / 2 ** 20:>12.1f} "
+          f"{elapsed:>10.2f} {hit * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--categories', type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        seed(path, args.rows, args.categories)
+        conn = sqlite3.connect(path)
+        print(f"{'frame':>10} {'memory MB':>12} {'pickle MB':>12} {'load s':>10} {'hit ms':>10}")
+        measure('default', lambda conn: pd.read_sql_query(QUERY, conn, params=("user0",)), conn)
+        measure('compact', lambda conn: repository._compact_frame(pd.read_sql_query(QUERY, conn, params=("user0",))), conn)
+        conn.close()
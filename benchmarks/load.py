@@ -0,0 +1,192 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import ai_service as ai
+import repository
+import report
+from datagen import PASSWORD, STATEMENT_COLUMNS, generate, make_statement, make_transactions
+
+# Tải giả lập nhiều phiên cùng lúc: mỗi phiên login -> dashboard -> thêm -> nhập file -> nhập bằng AI (StubModel) -> xóa,
+# báo p50/p99 từng bước và thông lượng (phiên/s). Chạy offline hoàn toàn.
+# --driver headless (mặc định): các phiên là thread trong 1 process, gọi repository đúng như main.py gọi ở mỗi bước
+#   -> dùng chung ReadPool/DbWriter/cache như server Streamlit thật (mỗi session 1 thread)
+# --driver apptest: chạy main.py thật bằng AppTest (có render UI). AppTest không chạy song song được trong 1 process
+#   nên mỗi worker là 1 process riêng (mỗi process có DbWriter riêng -> tranh khóa ghi SQLite giữa các process);
+#   AppTest không upload file được nên bước nhập file/AI gọi thẳng repository.
+# python benchmarks/load.py --users 20 --rows 5000 --sessions 200 --concurrency 8 --save benchmarks/results/load.json
+# python benchmarks/load.py --driver apptest --sessions 40 --concurrency 4 --baseline benchmarks/results/load_apptest.json
+# --shards N: chạy trên DB chia N shard để so với 1 file
+IMPORT_ROWS = 500
+AI_ROWS = 30
+DELETE_DATE = date(2030, 1, 1)  # mỗi phiên thêm giao dịch vào 1 ngày riêng sau khoảng dữ liệu sinh ra, bước xóa lọc theo ngày đó
+
+
+def session_plan(n, users):
+    # cùng n -> cùng user/ngày/dữ liệu nhập, 2 driver chạy cùng 1 kịch bản
+    rng = random.Random(n)
+    day = DELETE_DATE + timedelta(days=n)
+    filters = {'date_from': day, 'date_to': day, 'categories': (), 'amount_min': None, 'amount_max': None}
+    return rng, users[n % len(users)], day, filters
+
+
+def import_steps(user, rng, n, timer):
+    with timer('import'):
+        repository.add_records_from_file('expenses', user, make_statement(IMPORT_ROWS, rng, tag=f" #{n}"), STATEMENT_COLUMNS)
+    with timer('import_ai'):
+        df = make_transactions(AI_ROWS, rng, tag=f" #{n}")[['ngay', 'ten', 'so_tien']]
+        known, rest = repository.label_from_history(user, df, 'ten', 'so_tien', 'ngay')
+        parsed = pd.DataFrame(list(known) + ai.ask_ai_to_parse(rest, model=ai.StubModel(), keep_row=True))
+        repository.add_transactions_bulk(user, parsed.drop(columns='row').rename(
+            columns={'content': 'ten', 'amount': 'so_tien', 'category': 'danh_muc', 'date': 'ngay', 'type': 'loai'}))
+
+
+def check_deleted(user, filters):
+    # kịch bản tự kiểm tra: sau bước xóa không còn giao dịch nào trong ngày của phiên
+    count, _ = repository.get_filtered_summary('expenses', user, filters)
+    if count:
+        raise RuntimeError(f"{user}: còn {count} giao dịch sau bước xóa")
+
+
+def headless_session(n, users, timer):
+    rng, user, day, filters = session_plan(n, users)
+    with timer('login'):
+        if not repository.login_user(user, PASSWORD):
+            raise RuntimeError(f"không đăng nhập được {user}")
+    # mỗi lần rerun main.py đọc lại tổng thu/chi; tab lịch sử thêm biểu đồ và sổ cái
+    dashboard = lambda: (repository.get_totals(user), repository.get_category_sums('expenses', user),
+                         repository.get_monthly_sums('expenses', user))
+    with timer('dashboard'):
+        dashboard()
+        repository.get_ledger(user)
+    with timer('add'):
+        repository.add_expense(user, 'Phở bò', 50000, 'Ăn uống', day)
+        repository.add_income(user, 'Lương tháng', 15000000, 'Lương', day)
+        dashboard()
+    import_steps(user, rng, n, timer)
+    with timer('delete'):
+        repository.get_page('expenses', user, filters)
+        repository.get_filtered_summary('expenses', user, filters)
+        repository.del_records_where('expenses', user, filters)
+        repository.del_records_where('income', user, filters)
+        dashboard()
+    check_deleted(user, filters)
+
+
+def apptest_session(n, users, timer):
+    from streamlit.testing.v1 import AppTest
+
+    rng, user, day, filters = session_plan(n, users)
+    at = AppTest.from_file(os.path.join(ROOT, 'main.py'), default_timeout=120)
+    at.run()
+    with timer('login'):
+        at.sidebar.selectbox[0].select("Đăng Nhập").run()
+        at.text_input[0].input(user)
+        at.text_input[1].input(PASSWORD)
+        at.button[0].click().run()
+    with timer('dashboard'):
+        at.radio[0].set_value("Lịch sử chi tiêu").run()
+        at.radio[1].set_value("Sổ cái").run()
+    with timer('add'):
+        at.radio[0].set_value("Thêm giao dịch").run()
+        field = lambda elements, label: next(e for e in elements if e.label == label)
+        field(at.text_input, "Nội dung").input('Phở bò')
+        field(at.number_input, "Số tiền").set_value(50000)
+        field(at.date_input, "Ngày chi").set_value(day)
+        field(at.button, "Lưu chi tiêu").click().run()
+    import_steps(user, rng, n, timer)
+    with timer('delete'):
+        at.radio[0].set_value("Thay đổi giao dịch").run()
+        at.date_input(key="filter_dates_t4").set_value((day, day)).run()
+        at.checkbox(key="select_all_t4").check().run()
+        at.button(key="confirm_delete").click().run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    check_deleted(user, filters)
+
+
+DRIVERS = {'headless': headless_session, 'apptest': apptest_session}
+
+
+def step_timer(samples):
+    # timer('bước') là context manager ghi thời gian vào samples['bước'] (bước bị lỗi không tính)
+    @contextmanager
+    def timer(step):
+        start = time.perf_counter()
+        yield
+        samples[step].append(time.perf_counter() - start)
+    return timer
+
+
+def run_sessions(driver, ids, users, concurrency):
+    # chạy các phiên ids với tối đa concurrency phiên cùng lúc (thread), trả về {bước: [giây]}
+    samples = defaultdict(list)
+    timer = step_timer(samples)
+    def one(n):
+        with timer('session'):
+            DRIVERS[driver](n, users, timer)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, ids))
+    return dict(samples)
+
+
+def _worker(db_path, shard_dir, shard_count, driver, ids, users):
+    # entry của process con (driver apptest): mỗi process 1 luồng phiên tuần tự
+    repository.DB_PATH = db_path
+    repository.SHARD_DIR, repository.SHARD_COUNT = shard_dir, shard_count
+    return run_sessions(driver, ids, users, 1)
+
+
+def run_load(db_path, driver, sessions, concurrency, users):
+    start = time.perf_counter()
+    if driver == 'apptest':
+        # spawn: không fork process đang có thread writer/reader
+        with multiprocessing.get_context('spawn').Pool(concurrency) as pool:
+            parts = pool.starmap(_worker, [(db_path, repository.SHARD_DIR, repository.SHARD_COUNT, driver,
+                                            list(range(i, sessions, concurrency)), users) for i in range(concurrency)])
+        samples = defaultdict(list)
+        for part in parts:
+            for step, values in part.items():
+                samples[step].extend(values)
+    else:
+        samples = run_sessions(driver, range(sessions), users, concurrency)
+    return samples, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--driver', choices=list(DRIVERS), default='headless')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--shards', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    report.add_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        if args.shards is not None:
+            repository.SHARD_DIR, repository.SHARD_COUNT = os.path.join(tmp, 'shards'), args.shards
+        users = generate(db_path, args.users, args.rows, args.seed)
+        samples, seconds = run_load(db_path, args.driver, args.sessions, args.concurrency, users)
+        repository.get_writer().close()
+    # ops/s = số lần bước đó hoàn thành / thời gian chạy thực của cả đợt tải
+    results = {f"{args.driver}.{step}": report.summarize(values, seconds) for step, values in samples.items()}
+    print(f"{args.sessions} phiên, {args.concurrency} song song, {seconds:.1f} s: {args.sessions / seconds:.1f} phiên/s")
+    sys.exit(report.finish(results, args, benchmark='load', driver=args.driver, users=args.users, rows=args.rows,
+                           sessions=args.sessions, concurrency=args.concurrency, shards=args.shards))
@@ -0,0 +1,85 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import repository
+from db_reader import ReadPool
+from db_writer import DbWriter
+
+# So sánh thông lượng đọc: 1 connection dùng chung (get_connection cũ) vs ReadPool
+# python benchmarks/read_pool.py --users 50 --rows 2000 --threads 1,2,4,8
+QUERY = "SELECT item_name, category, date, amount FROM expenses WHERE owner=?"
+
+
+def seed(path, users, rows):
+    writer = DbWriter(path)
+    writer.run(repository.migrate)
+    def write(c):
+        for u in range(users):
+            c.executemany("INSERT INTO expenses(owner, item_name, amount, category, date) VALUES (?,?,?,?,?)",
+                          ((f"user{u}", f"item{i}", i * 1000.0, f"cat{i % 5}", f"2024-{i % 12 + 1:02d}-01")
+                           for i in range(rows)))
+    writer.run(write)
+    return writer
+
+
+def run_shared(path, users, threads, seconds):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    def read():
+        conn.execute(QUERY, (f"user{random.randrange(users)}",)).fetchall()
+    try:
+        return measure(read, threads, seconds)
+    finally:
+        conn.close()
+
+
+def run_pool(path, users, threads, seconds):
+    pool = ReadPool(path, size=threads)
+    def read():
+        with pool.connection() as conn:
+            conn.execute(QUERY, (f"user{random.randrange(users)}",)).fetchall()
+    try:
+        return measure(read, threads, seconds)
+    finally:
+        pool.close()
+
+
+def measure(read, threads, seconds):
+    counts = [0] * threads
+    stop = time.monotonic() + seconds
+    def worker(n):
+        while time.monotonic() < stop:
+            read()
+            counts[n] += 1
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sum(counts) / seconds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--threads', default='1,2,4,8')
+    parser.add_argument('--seconds', type=float, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        writer = seed(path, args.users, args.rows)
+        print(f"{'threads':>8} {'shared q/s':>12} {'pool q/s':>12}")
+        for threads in [int(t) for t in args.threads.split(',')]:
+            shared = run_shared(path, args.users, threads, args.seconds)
+            pooled = run_pool(path, args.users, threads, args.seconds)
+            print(f"{threads:>8} {shared:>12.0f} {pooled:>12.0f}")
+        writer.close()
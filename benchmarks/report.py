@@ -0,0 +1,76 @@
+import json
+import os
+import platform
+import sqlite3
+import time
+
+import numpy as np
+
+# Dùng chung cho data_layer.py và load.py: p50/p99 từ mẫu thời gian, lưu kết quả ra JSON,
+# so với baseline đã lưu (--baseline) và báo các phép đo chậm đi quá ngưỡng.
+# Kết quả: {'meta': {...}, 'results': {tên: {'count', 'p50_ms', 'p99_ms', 'mean_ms', 'ops_s'}}}
+MAX_REGRESSION = 0.25  # chậm hơn baseline 25% (p50) thì báo lỗi
+
+
+def summarize(samples, seconds=None):
+    # samples: list thời gian (giây); seconds: thời gian chạy thực (mặc định tổng các mẫu, tức chạy tuần tự)
+    ms = np.asarray(samples, dtype=float) * 1000
+    seconds = seconds if seconds is not None else ms.sum() / 1000
+    return {
+        'count': len(ms),
+        'p50_ms': float(np.percentile(ms, 50)) if len(ms) else None,
+        'p99_ms': float(np.percentile(ms, 99)) if len(ms) else None,
+        'mean_ms': float(ms.mean()) if len(ms) else None,
+        'ops_s': len(ms) / seconds if seconds else None,
+    }
+
+
+def print_table(results, baseline=None):
+    base = (baseline or {}).get('results', {})
+    print(f"{'phép đo':<34} {'n':>6} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'p50 so với baseline':>20}")
+    for name, r in results.items():
+        diff = ''
+        if name in base and base[name]['p50_ms']:
+            diff = f"{r['p50_ms'] / base[name]['p50_ms'] - 1:+.0%}"
+        print(f"{name:<34} {r['count']:>6} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['ops_s'] or 0:>9.1f} {diff:>20}")
+
+
+def save(path, results, **meta):
+    meta.update(time=time.strftime('%Y-%m-%d %H:%M:%S'), python=platform.python_version(),
+                sqlite=sqlite3.sqlite_version, machine=platform.node())
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def regressions(results, baseline, max_regression=MAX_REGRESSION):
+    # tên các phép đo có p50 chậm hơn baseline quá max_regression (chỉ so phép đo có ở cả 2 bên)
+    base = baseline['results']
+    return [name for name, r in results.items()
+            if name in base and base[name]['p50_ms'] and r['p50_ms'] > base[name]['p50_ms'] * (1 + max_regression)]
+
+
+def finish(results, args, **meta):
+    # in bảng, --save/--baseline/--max-regression chung cho các script; trả về mã thoát
+    baseline = load(args.baseline) if args.baseline else None
+    print_table(results, baseline)
+    if args.save:
+        save(args.save, results, **meta)
+        print(f"Đã lưu kết quả: {args.save}")
+    if baseline:
+        slow = regressions(results, baseline, args.max_regression)
+        if slow:
+            print(f"LỖI: chậm hơn baseline quá {args.max_regression:.0%}: {', '.join(slow)}")
+            return 1
+    return 0
+
+
+def add_arguments(parser):
+    parser.add_argument('--save', help="lưu kết quả ra file JSON (dùng làm baseline lần sau)")
+    parser.add_argument('--baseline', help="file JSON đã lưu để so sánh")
+    parser.add_argument('--max-regression', type=float, default=MAX_REGRESSION)
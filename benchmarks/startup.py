@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Thời gian import main.py (process mới mỗi lần) và thời gian 1 lần rerun của app (AppTest, DB tạm)
+# python benchmarks/startup.py --runs 5 --max-import-ms 1500
+# trả về mã 1 nếu import quá --max-import-ms hoặc kéo theo module đáng lẽ phải import lười
+LAZY_MODULES = ['google.generativeai', 'openpyxl']
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import main
+print(json.dumps({'seconds': time.perf_counter() - start, 'modules': [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def measure_import(runs):
+    times, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=ROOT, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result['seconds'])
+        loaded.update(result['modules'])
+    return times, sorted(loaded)
+
+
+def measure_reruns(runs):
+    from streamlit.testing.v1 import AppTest
+    import repository
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repository.DB_PATH = os.path.join(tmp, 'bench.db')
+        repository.init_db()
+        repository.add_expense('bench', 'pho', 50000, 'Ăn uống', '2024-01-02')
+        repository.add_income('bench', 'luong', 1000000, 'Lương', '2024-01-05')
+
+        at = AppTest.from_file(os.path.join(ROOT, 'main.py'), default_timeout=60)
+        at.session_state['logged_in'] = True
+        at.session_state['username'] = 'bench'
+        start = time.perf_counter()
+        at.run()
+        first = time.perf_counter() - start
+        reruns = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            at.run()
+            reruns.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        repository.get_writer().close()
+        return first, reruns
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float)
+    args = parser.parse_args()
+
+    times, loaded = measure_import(args.runs)
+    import_ms = statistics.median(times) * 1000
+    print(f"import main: median {import_ms:.0f} ms, min {min(times) * 1000:.0f} ms ({args.runs} lần)")
+    first, reruns = measure_reruns(args.runs)
+    print(f"lần chạy đầu: {first * 1000:.0f} ms, rerun: median {statistics.median(reruns) * 1000:.0f} ms")
+
+    failed = False
+    if loaded:
+        print(f"LỖI: import main kéo theo {', '.join(loaded)}")
+        failed = True
+    if args.max_import_ms and import_ms > args.max_import_ms:
+        print(f"LỖI: import main {import_ms:.0f} ms > {args.max_import_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,106 @@
+import functools
+import pickle
+import threading
+from collections import OrderedDict
+
+import metrics
+
+# Cache kết quả đọc cho repository, thay cho st.cache_data để dùng được ngoài Streamlit.
+# Backend đổi được bằng set_backend(): MemoryCache (mặc định, dùng chung cả process như cache_data)
+# hoặc NullCache (CLI/batch job: đọc thẳng DB, không giữ gì trong RAM).
+# Key gồm cả version dữ liệu của owner nên không cần xóa cache khi ghi; lưu version mới thì bản của
+# version cũ (cùng hàm + cùng tham số) bị bỏ luôn, không nằm chờ LRU đẩy ra.
+# Giới hạn cả số entry lẫn tổng dung lượng (byte pickle), vượt thì bỏ entry lâu không dùng nhất.
+MAX_ENTRIES = 1000
+MAX_BYTES = 256 * 1024 * 1024
+
+
+class MemoryCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (group, pickle)
+        self.groups = {}  # group -> key đang lưu
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        # trả về (hit, value); lưu dạng pickle nên mỗi lần hit là 1 bản copy, caller sửa frame thoải mái
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            self.entries.move_to_end(key)
+        return True, pickle.loads(entry[1])
+
+    def set(self, key, value, group=None):
+        # group: các key cùng group chỉ giữ bản mới nhất (cached() dùng mọi tham số trừ version)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            self._drop(key)
+            if group is not None:
+                self._drop(self.groups.get(group))
+                self.groups[group] = key
+            self.entries[key] = (group, data)
+            self.bytes += len(data)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        group, data = entry
+        self.bytes -= len(data)
+        if self.groups.get(group) == key:
+            del self.groups[group]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.groups.clear()
+            self.bytes = 0
+
+
+class NullCache:
+    def get(self, key):
+        return False, None
+
+    def set(self, key, value, group=None):
+        pass
+
+    def clear(self):
+        pass
+
+
+_backend = MemoryCache()
+
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+
+def get_backend():
+    return _backend
+
+
+def cached(fn):
+    # tham số phải có repr ổn định (str, số, date, tuple, dict filters...); tham số cuối là version dữ liệu
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        backend = _backend
+        key = repr((name, args, sorted(kwargs.items())))
+        group = repr((name, args[:-1], sorted(kwargs.items())))
+        hit, value = backend.get(key)
+        metrics.incr('cache', fn=fn.__name__, result='hit' if hit else 'miss')
+        if hit:
+            return value
+        value = fn(*args, **kwargs)
+        backend.set(key, value, group)
+        return value
+    return wrapper
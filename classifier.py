@@ -0,0 +1,111 @@
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+# Naive Bayes phân loại tên giao dịch -> (bảng, danh mục) từ lịch sử của chính user.
+# Đếm token lưu trong classifier_tokens/classifier_labels, cộng dồn mỗi lần insert, trừ lại khi sửa/xóa.
+MIN_CONFIDENCE = 0.9
+MIN_LABELS = 2  # chỉ có 1 nhãn thì xác suất luôn = 1, không nói lên gì
+MIN_TOKEN_COUNT = 2  # token phải xuất hiện trong ít nhất 2 giao dịch cũ mới được tính
+TOKEN_CHUNK_SIZE = 500
+
+
+def tokenize(text):
+    # bỏ dấu + chữ thường để "Phở Hà Nội" và "PHO HA NOI" ra cùng token; bỏ số (mã GD, số tiền)
+    text = unicodedata.normalize('NFKD', str(text).lower()).replace('đ', 'd')
+    words = re.findall(r'[a-z]+', ''.join(ch for ch in text if not unicodedata.combining(ch)))
+    return sorted(set(words + [f"{a} {b}" for a, b in zip(words, words[1:])]))
+
+
+def _add_counts(c, owner, table_name, names, categories, sign):
+    tokens, docs, token_totals = Counter(), Counter(), Counter()
+    for name, category in zip(names, categories):
+        features = tokenize('' if name is None else name)
+        category = '' if category is None else category
+        docs[category] += 1
+        token_totals[category] += len(features)
+        for token in features:
+            tokens[token, category] += 1
+    c.executemany("INSERT INTO classifier_tokens(owner, token, table_name, category, count) VALUES (?,?,?,?,?) "
+                  "ON CONFLICT(owner, token, table_name, category) DO UPDATE SET count = count + excluded.count",
+                  [(owner, token, table_name, category, sign * count) for (token, category), count in tokens.items()])
+    c.executemany("INSERT INTO classifier_labels(owner, table_name, category, docs, tokens) VALUES (?,?,?,?,?) "
+                  "ON CONFLICT(owner, table_name, category) DO UPDATE SET docs = docs + excluded.docs, tokens = tokens + excluded.tokens",
+                  [(owner, table_name, category, sign * count, sign * token_totals[category]) for category, count in docs.items()])
+    return tokens, docs
+
+
+def learn(c, owner, table_name, names, categories):
+    # gọi trong transaction ghi, cùng lúc với INSERT vào bảng gốc
+    _add_counts(c, owner, table_name, names, categories, 1)
+
+
+def unlearn(c, owner, table_name, names, categories):
+    # ngược lại learn: gọi cùng transaction với DELETE (hoặc UPDATE tên/danh mục, trước khi learn giá trị mới)
+    tokens, docs = _add_counts(c, owner, table_name, names, categories, -1)
+    c.executemany("DELETE FROM classifier_tokens WHERE owner=? AND token=? AND table_name=? AND category=? AND count <= 0",
+                  [(owner, token, table_name, category) for token, category in tokens])
+    c.executemany("DELETE FROM classifier_labels WHERE owner=? AND table_name=? AND category=? AND docs <= 0",
+                  [(owner, table_name, category) for category in docs])
+
+
+def train(c, owner, name_columns):
+    # học lại từ đầu theo lịch sử hiện có của owner
+    c.execute("DELETE FROM classifier_tokens WHERE owner=?", (owner,))
+    c.execute("DELETE FROM classifier_labels WHERE owner=?", (owner,))
+    for table_name, name_col in name_columns.items():
+        rows = c.execute(f"SELECT {name_col}, category FROM {table_name} WHERE owner=?", (owner,)).fetchall()
+        if rows:
+            names, categories = zip(*rows)
+            learn(c, owner, table_name, names, categories)
+    c.execute("DELETE FROM classifier_pending WHERE owner=?", (owner,))
+
+
+def needs_training(conn, owner):
+    return conn.execute("SELECT 1 FROM classifier_pending WHERE owner=?", (owner,)).fetchone() is not None
+
+
+def predict(conn, owner, names, min_confidence=MIN_CONFIDENCE):
+    # trả về list (table_name, category, xác suất) hoặc None cho dòng chưa đủ tự tin
+    labels = conn.execute("SELECT table_name, category, docs, tokens FROM classifier_labels WHERE owner=?", (owner,)).fetchall()
+    if len(labels) < MIN_LABELS:
+        return [None] * len(names)
+    label_keys = [(table_name, category) for table_name, category, _, _ in labels]
+    label_pos = {key: i for i, key in enumerate(label_keys)}
+    docs = np.array([row[2] for row in labels], dtype=float)
+    token_totals = np.array([row[3] for row in labels], dtype=float)
+
+    features = [tokenize('' if name is None else name) for name in names]
+    vocabulary = sorted(set().union(*features))
+    counts = {}
+    for i in range(0, len(vocabulary), TOKEN_CHUNK_SIZE):
+        chunk = vocabulary[i:i + TOKEN_CHUNK_SIZE]
+        for token, table_name, category, count in conn.execute(
+                f"SELECT token, table_name, category, count FROM classifier_tokens "
+                f"WHERE owner=? AND token IN ({','.join('?' * len(chunk))})", (owner, *chunk)):
+            counts.setdefault(token, np.zeros(len(label_keys)))[label_pos[table_name, category]] += count
+    vocab_size = conn.execute("SELECT COUNT(DISTINCT token) FROM classifier_tokens WHERE owner=?", (owner,)).fetchone()[0]
+
+    # log P(nhãn) + tổng log P(token | nhãn), Laplace smoothing; token chưa gặp (hoặc gặp quá ít) thì bỏ qua
+    log_prior = np.log(docs / docs.sum())
+    log_denominator = np.log(token_totals + vocab_size)
+    log_likelihood = {token: np.log(row + 1) - log_denominator for token, row in counts.items()
+                      if row.sum() >= MIN_TOKEN_COUNT}
+
+    results, seen = [], {}
+    for tokens in features:
+        key = tuple(tokens)
+        if key not in seen:
+            known = [log_likelihood[t] for t in tokens if t in log_likelihood]
+            seen[key] = None
+            if known:
+                scores = log_prior + np.sum(known, axis=0)
+                probs = np.exp(scores - scores.max())
+                probs /= probs.sum()
+                best = int(probs.argmax())
+                if probs[best] >= min_confidence:
+                    seen[key] = (label_keys[best][0], label_keys[best][1], float(probs[best]))
+        results.append(seen[key])
+    return results
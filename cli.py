@@ -0,0 +1,121 @@
+import argparse
+import sys
+
+import cache
+import repository as repo
+
+# Chạy các việc nặng ngoài UI, không cần Streamlit:
+# python cli.py import sao_ke.csv --owner u --ten "Nội dung" --so-tien "Số tiền" --danh-muc "Danh mục" --ngay "Ngày"
+# python cli.py export --owner u --table income --out thu_nhap.csv
+# python cli.py rollups verify|rebuild [--owner u]
+# python cli.py migrate
+# python cli.py --shard-dir shards --shard-count 16 shard   (chia DB 1 file thành các shard, chạy khi app đã dừng)
+# các lệnh khác chạy trên DB đã chia thì cũng phải truyền --shard-dir/--shard-count giống lúc chia
+TABLES = list(repo.NAME_COLUMNS)
+
+
+def cmd_import(args):
+    columns = {'ten': args.ten, 'so_tien': args.so_tien, 'danh_muc': args.danh_muc, 'ngay': args.ngay}
+    with open(args.file, 'rb') as f:
+        def progress(done, n):
+            print(f"\r{done:6.1%}  {n} dòng", end='', file=sys.stderr, flush=True)
+        inserted, skipped, errors = repo.add_records_from_file(args.table, args.owner, f, columns, progress)
+    print(file=sys.stderr)
+    print(f"Đã thêm {inserted} giao dịch, bỏ qua {skipped} giao dịch đã có, {len(errors)} dòng lỗi.")
+    if not errors.empty:
+        print(errors.head(20).to_string(index=False))
+    return 1 if not errors.empty else 0
+
+
+def cmd_export(args):
+    out = open(args.out, 'w', encoding='utf-8', newline='') if args.out else sys.stdout
+    try:
+        count, header = 0, True
+        for chunk in repo.iter_records(args.table, args.owner):
+            chunk.to_csv(out, index=False, header=header)
+            count, header = count + len(chunk), False
+    finally:
+        if args.out:
+            out.close()
+    print(f"Đã xuất {count} giao dịch.", file=sys.stderr)
+    return 0
+
+
+def cmd_rollups(args):
+    if args.action == 'rebuild':
+        repo.rebuild_rollups(args.owner)
+    mismatches = repo.verify_rollups(args.owner)
+    if mismatches.empty:
+        print("monthly_rollups khớp với bảng gốc.")
+        return 0
+    print(f"Có {len(mismatches)} nhóm bị lệch:")
+    print(mismatches.to_string(index=False))
+    return 1
+
+
+def cmd_migrate(args):
+    # DB_PATH (bảng users) + mọi file shard như init_db
+    print(f"Schema version: {repo.migrate_all()}")
+    return 0
+
+
+def cmd_shard(args):
+    if repo.SHARD_DIR is None:
+        print("Cần --shard-dir", file=sys.stderr)
+        return 2
+    def progress(done, total):
+        print(f"\r{done}/{total} shard", end='', file=sys.stderr, flush=True)
+    copied = repo.split_database(progress)
+    print(file=sys.stderr)
+    print(f"Đã chia {repo.DB_PATH} vào {repo.SHARD_DIR} (layout {repo.shard_layout()}), bản sao cũ: {repo.DB_PATH}.before-shard")
+    for table_name, count in copied.items():
+        print(f"  {table_name}: {count} dòng")
+    return 0
+
+
+def run(argv):
+    parser = argparse.ArgumentParser(prog='cli.py')
+    parser.add_argument('--db', default=repo.DB_PATH, help="đường dẫn file SQLite")
+    parser.add_argument('--shard-dir', help="thư mục shard (bật chế độ mỗi nhóm user 1 file)")
+    parser.add_argument('--shard-count', type=int, default=repo.SHARD_COUNT, help="số file shard (>= 1)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('import', help="nhập file .csv/.xlsx theo lô")
+    p.add_argument('file')
+    p.add_argument('--owner', required=True)
+    p.add_argument('--table', choices=TABLES, default='expenses')
+    p.add_argument('--ten', required=True, help="cột nội dung")
+    p.add_argument('--so-tien', required=True, help="cột số tiền")
+    p.add_argument('--danh-muc', required=True, help="cột danh mục")
+    p.add_argument('--ngay', required=True, help="cột ngày")
+    p.set_defaults(handler=cmd_import)
+
+    p = commands.add_parser('export', help="xuất giao dịch ra CSV")
+    p.add_argument('--owner', required=True)
+    p.add_argument('--table', choices=TABLES, default='expenses')
+    p.add_argument('--out', help="mặc định in ra stdout")
+    p.set_defaults(handler=cmd_export)
+
+    p = commands.add_parser('rollups', help="kiểm tra/tính lại monthly_rollups")
+    p.add_argument('action', choices=['verify', 'rebuild'])
+    p.add_argument('--owner')
+    p.set_defaults(handler=cmd_rollups)
+
+    p = commands.add_parser('migrate', help="chạy migration schema")
+    p.set_defaults(handler=cmd_migrate)
+
+    p = commands.add_parser('shard', help="chia DB 1 file thành các shard theo --shard-dir/--shard-count")
+    p.set_defaults(handler=cmd_shard)
+
+    args = parser.parse_args(argv)
+    repo.DB_PATH = args.db
+    repo.SHARD_DIR, repo.SHARD_COUNT = args.shard_dir, args.shard_count
+    # chạy 1 lần rồi thoát: đọc thẳng DB, không giữ cache
+    cache.set_backend(cache.NullCache())
+    if args.command not in ('migrate', 'shard'):
+        repo.init_db()
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(run(sys.argv[1:]))
@@ -0,0 +1,54 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+# Pool connection chỉ-đọc: WAL cho phép nhiều reader chạy song song với writer,
+# mỗi lần đọc mượn 1 connection riêng thay vì dùng chung 1 connection cho mọi session.
+# Streamlit tạo thread mới cho mỗi lần rerun nên dùng pool giới hạn thay vì thread-local.
+READ_POOL_SIZE = 8
+READ_PRAGMAS = [
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",  # ~16 MB page cache mỗi connection
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+]
+
+
+class ReadPool:
+    def __init__(self, path, size=READ_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        # mode=ro: file DB phải tồn tại (writer tạo trước khi có lệnh đọc)
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        for pragma in READ_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        # chờ khi cả `size` connection đang được dùng
+        start = time.perf_counter()
+        with self.slots:
+            metrics.observe('db.read_pool_wait', time.perf_counter() - start)
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                self.idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,104 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+
+# Single-writer: 1 thread giữ connection ghi, các session gửi job vào queue.
+# Job đến trong cùng cửa sổ GROUP_WINDOW được gom vào 1 transaction (group commit),
+# mỗi job chạy trong SAVEPOINT riêng nên job lỗi không kéo job khác rollback theo.
+GROUP_WINDOW = 0.002
+MAX_BATCH = 256
+
+
+class DbWriter:
+    def __init__(self, path, window=GROUP_WINDOW, max_batch=MAX_BATCH):
+        self.path = path
+        self.window = window
+        self.max_batch = max_batch
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args):
+        # fn(cursor, *args) chạy trong thread ghi; trả về Future chứa kết quả của fn
+        future = Future()
+        self.jobs.put((fn, args, future, time.perf_counter()))
+        return future
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    def close(self):
+        self.jobs.put(None)
+        self.thread.join()
+
+    def _connect(self):
+        # isolation_level=None: tự quản lý BEGIN/COMMIT, module sqlite3 không chèn BEGIN ngầm
+        conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        # WAL + NORMAL: không fsync mỗi commit, chỉ fsync lúc checkpoint; DB vẫn nhất quán khi crash
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        return conn
+
+    def _next_batch(self):
+        first = self.jobs.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # đóng sau khi ghi xong batch hiện tại
+                self.jobs.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        conn = self._connect()
+        c = conn.cursor()
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            done = []
+            started = time.perf_counter()
+            try:
+                # IMMEDIATE: giữ write lock ngay từ đầu, process khác phải chờ
+                c.execute("BEGIN IMMEDIATE")
+                # thời gian job nằm trong queue + chờ write lock (thay cho thời gian chờ db_lock trước đây)
+                locked = time.perf_counter()
+                for fn, args, future, queued in batch:
+                    metrics.observe('db.writer_wait', locked - queued)
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    c.execute("SAVEPOINT job")
+                    try:
+                        result = fn(c, *args)
+                    except Exception as e:
+                        c.execute("ROLLBACK TO job")
+                        c.execute("RELEASE job")
+                        future.set_exception(e)
+                        continue
+                    c.execute("RELEASE job")
+                    done.append((future, result))
+                c.execute("COMMIT")
+                metrics.observe('db.writer_transaction', time.perf_counter() - started, rows=len(batch))
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                for fn, args, future, queued in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future, result in done:
+                future.set_result(result)
+        conn.close()
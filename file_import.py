@@ -0,0 +1,76 @@
+import pandas as pd
+
+# Đọc file upload theo từng lô thay vì load cả file: .csv qua read_csv(chunksize),
+# .xlsx qua openpyxl read_only (duyệt từng dòng, không dựng cả sheet trong RAM).
+# Cột đọc dạng chuỗi (ô số của .xlsx giữ nguyên số), prepare_records tự parse số tiền/ngày.
+# uploaded_file: UploadedFile của Streamlit hoặc file nhị phân bất kỳ có .name (open(path, 'rb')).
+PREVIEW_ROWS = 100
+IMPORT_BATCH_ROWS = 20_000
+
+
+def _is_csv(uploaded_file):
+    return uploaded_file.name.lower().endswith('.csv')
+
+
+def _xlsx_rows(uploaded_file):
+    import openpyxl
+    uploaded_file.seek(0)
+    workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    sheet = workbook.active
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None) or ()
+    columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+    # max_row lấy từ thẻ dimension của file, có thể không có
+    return workbook, columns, rows, sheet.max_row or 0
+
+
+def read_preview(uploaded_file, n=PREVIEW_ROWS):
+    # n dòng đầu để chọn cột (thay cho df_upload.head())
+    if _is_csv(uploaded_file):
+        uploaded_file.seek(0)
+        return pd.read_csv(uploaded_file, nrows=n, dtype=str)
+    workbook, columns, rows, _ = _xlsx_rows(uploaded_file)
+    try:
+        return _xlsx_frame([row[:len(columns)] for _, row in zip(range(n), rows)], columns, 0)
+    finally:
+        workbook.close()
+
+
+def iter_batches(uploaded_file, columns, batch_rows=IMPORT_BATCH_ROWS):
+    # yield (DataFrame chỉ gồm các cột cần lấy, tiến độ 0..1); index liên tục theo số dòng trong file
+    if _is_csv(uploaded_file):
+        size = uploaded_file.seek(0, 2) or 1
+        uploaded_file.seek(0)
+        for chunk in pd.read_csv(uploaded_file, usecols=columns, dtype=str, chunksize=batch_rows):
+            yield chunk[columns], min(uploaded_file.tell() / size, 1.0)
+        return
+
+    workbook, header, rows, total = _xlsx_rows(uploaded_file)
+    try:
+        positions = [header.index(col) for col in columns]
+        batch, start = [], 0
+        for row in rows:
+            batch.append([row[i] if i < len(row) else None for i in positions])
+            if len(batch) == batch_rows:
+                yield _xlsx_frame(batch, columns, start), min((start + len(batch)) / max(total - 1, 1), 1.0)
+                start += len(batch)
+                batch = []
+        if batch:
+            yield _xlsx_frame(batch, columns, start), 1.0
+    finally:
+        workbook.close()
+
+
+def _xlsx_frame(batch, columns, start):
+    # ô trống -> None, ô số giữ nguyên int/float (str(1.234) = "1.234" sẽ bị đọc thành 1234 đồng),
+    # còn lại là chuỗi như read_csv(dtype=str) (ngày thành "2024-01-31 00:00:00")
+    batch = [[v if v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) else str(v) for v in row]
+             for row in batch]
+    return pd.DataFrame(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch)), dtype=object)
+
+
+def read_all(uploaded_file, batch_rows=IMPORT_BATCH_ROWS):
+    # cả file (mọi cột) cho luồng AI; ghép từ các lô để không giữ thêm bản sao của file gốc
+    columns = read_preview(uploaded_file, 0).columns.tolist()
+    frames = [batch for batch, _ in iter_batches(uploaded_file, columns, batch_rows)]
+    return pd.concat(frames) if frames else pd.DataFrame(columns=columns)
@@ -1,158 +1,50 @@
 import streamlit as st
-import sqlite3
-import hashlib
 import pandas as pd
-from datetime import datetime
-import google.generativeai as genai
-import json
+import time
 import ai_service as ai
-import threading
-# tao bang
+import file_import
+import repository as repo
+import metrics
+# giao diện Streamlit; đọc/ghi dữ liệu qua repository.py
 
-db_lock = threading.Lock()
-@st.cache_resource
-def get_connection():
-    connection = sqlite3.connect('expense_db.db', check_same_thread=False)
-    connection.execute("PRAGMA journal_mode=WAL;") 
-    return connection
-
-def init_db():
-    # CHỈ MỘT NGƯỜI ĐƯỢC TẠO BẢNG 1 LÚC
-    with db_lock:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                password TEXT
-            )
-        ''')
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS expenses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                owner TEXT,
-                item_name TEXT,
-                amount REAL,
-                category TEXT,
-                date DATE
-            )
-        ''')
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS income (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                owner TEXT,
-                source TEXT,
-                amount REAL,
-                category TEXT,
-                date DATE
-            )
-        ''')
-        conn.commit()
-# encrypt password
-def make_hashes(password):
-    return hashlib.sha256(str.encode(password)).hexdigest()
-
-
-def check_hashes(password, hashed_text):
-    if make_hashes(password) == hashed_text:
-        return True
-    return False
-
-
-# main funct
-
-# tạo user
-def create_user(username, password):
-    with db_lock: 
-        conn = get_connection()
-        c = conn.cursor()
-        try:
-            c.execute('INSERT INTO users(username, password) VALUES (?,?)',
-                      (username, make_hashes(password)))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-
-# đăng nhập cho user
-def login_user(username, password):
-    # Đọc thì không cần khóa quá chặt, nhưng nên dùng cursor mới
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT * FROM users WHERE username =? AND password = ?',
-              (username, make_hashes(password)))
-    data = c.fetchall()
-    return data
-
-
-# funct expenses
-# def add_expense(owner, expense_name, amount, category, date):
-#     db=sqlite3.connect('expense_db.db')
-#     c=db.cursor()
-#     # bug fixed: 4 out of 5 columns
-#     c.execute('insert into expenses(owner, item_name, amount, category, date) values (?,?,?,?,?)',
-#         (owner,expense_name,amount,category,date))
-#     db.commit()
-#     db.close()
-def add_expense(owner, expense_name, amount, category, date):
-    with db_lock: 
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute('INSERT INTO expenses(owner, item_name, amount, category, date) VALUES (?,?,?,?,?)',
-            (owner, expense_name, amount, category, date))
-        conn.commit()
-    st.cache_data.clear()
-
-# def add_income(owner, income_name, amount, category, date):
-#     db=sqlite3.connect('expense_db.db')
-#     c=db.cursor()
-#     # bug fixed: 4 out of 5 columns
-#     c.execute('insert into income(owner, source, amount, category, date) values (?,?,?,?,?)',
-#         (owner,income_name,amount,category,date))
-#     db.commit()
-#     db.close()
-
-def add_income(owner, income_name, amount, category, date):
-    with db_lock: # <--- BẮT BUỘC CÓ LOCK
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute('INSERT INTO income(owner, source, amount, category, date) VALUES (?,?,?,?,?)',
-            (owner, income_name, amount, category, date))
-        conn.commit()
-    st.cache_data.clear()
-
-@st.cache_data(ttl=10)
-def view_expenses(user):
-    conn = get_connection()
+AI_RENDER_INTERVAL = 0.3
 
-    return pd.read_sql_query("SELECT item_name as ten, category as danh_muc, date as ngay, amount as so_tien FROM expenses WHERE owner=?", conn, params=(user,))
-
-@st.cache_data(ttl=10)
-def view_income(user):
-    conn = get_connection()
-    return pd.read_sql_query("SELECT source as ten, category as danh_muc, date as ngay, amount as so_tien FROM income WHERE owner=?", conn, params=(user,))
-
-def del_record(table_name, record_id, owner):
-    with db_lock: # <--- BẮT BUỘC CÓ LOCK
-        conn = get_connection()
-        c = conn.cursor()
-        query = f"DELETE FROM {table_name} WHERE id=? AND owner=?"
-        c.execute(query, (record_id, owner))
-        conn.commit()
-    st.cache_data.clear()
+@st.cache_resource
+def setup_db():
+    # migration + kiểm tra query plan 1 lần mỗi process, không chạy lại mỗi lần rerun
+    # SHARD_DIR/SHARD_COUNT trong secrets: bật chế độ chia dữ liệu user ra nhiều file SQLite (xem repository.py)
+    repo.SHARD_DIR = get_secret("SHARD_DIR", repo.SHARD_DIR)
+    repo.SHARD_COUNT = int(get_secret("SHARD_COUNT", repo.SHARD_COUNT))
+    repo.init_db()
+    return True
+
+def get_secret(name, default=None):
+    # chạy local có thể không có secrets.toml
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+def get_admins():
+    # ADMINS là list ["a", "b"] hoặc chuỗi "a, b" -> set tên (so khớp cả tên, không phải chuỗi con)
+    admins = get_secret("ADMINS", [])
+    if isinstance(admins, str):
+        admins = admins.split(',')
+    return {str(name).strip() for name in admins} - {''}
 
-def get_data_with_id(table_name, owner):
-    conn = get_connection()
-    if table_name == "expenses":
-        query = "SELECT * FROM expenses WHERE owner=?"
-    else:
-        query = "SELECT * FROM income WHERE owner=?"
-    return pd.read_sql_query(query, conn, params=(owner,))
+@st.cache_resource
+def start_metrics_export():
+    # METRICS_FILE trong secrets: *.prom (Prometheus text, ghi đè) hoặc *.jsonl (thêm 1 dòng mỗi lần ghi)
+    path = get_secret("METRICS_FILE")
+    if path:
+        metrics.start_exporter(path)
+    return path
 
 # main gui
 def main():
     st.set_page_config(page_title="Quản lý chi tiêu",layout="wide")
-    init_db()
+    setup_db()
+    start_metrics_export()
 
     
     st.title("Quản Lý Chi Tiêu Cá Nhân")
@@ -172,7 +64,7 @@ def main():
             new_password = st.text_input("Password", type='password')
 
             if st.button("Đăng Ký"):
-                if create_user(new_user, new_password):
+                if repo.create_user(new_user, new_password):
                     st.success("Đã tạo tài khoản thành công! Vui lòng chuyển sang tab Đăng Nhập.")
                 else:
                     st.warning("Tài khoản đã tồn tại!")
@@ -183,7 +75,7 @@ def main():
             password = st.text_input("Password", type='password')
 
             if st.button("Login"):
-                result = login_user(username, password)
+                result = repo.login_user(username, password)
                 if result:
                     st.success(f"Chào mừng {username} quay trở lại!")
                     st.session_state['logged_in'] = True
@@ -200,16 +92,21 @@ def main():
         if butt:
             st.session_state['logged_in'] = False
             st.rerun()
+        # panel hiệu năng: chỉ user có trong ADMINS (secrets) mới thấy
+        if user in get_admins():
+            with st.sidebar.expander("Hiệu năng"):
+                timings, counts = metrics.snapshot()
+                st.dataframe(timings[['name', 'labels', 'count', 'p50_ms', 'p99_ms', 'avg_ms', 'rows']].round(1), hide_index=True)
+                st.dataframe(counts, hide_index=True)
+                if st.button("Reset số liệu", key="metrics_reset"):
+                    metrics.reset()
+                    st.rerun()
 
         #set avatar user
         st.title("Dashboard")
 
         #METRICS
-        df_expense = view_expenses(user)
-        df_income = view_income(user)
-
-        total_expense = df_expense['so_tien'].sum() if not df_expense.empty else 0
-        total_income = df_income['so_tien'].sum() if not df_income.empty else 0
+        total_income, total_expense = repo.get_totals(user)
         balance = total_income - total_expense
         col1, col2, col3 = st.columns(3)
         col1.metric("Tổng Thu Nhập", f"{total_income:,.0f} VND", )
@@ -226,214 +123,309 @@ def main():
         
         cat_out=["Ăn uống", "Di chuyển", "Nhà cửa", "Giải trí", "Khác"]
         cat_in=["Lương", "Hoa Hồng", "Nghề tay trái", "Rửa tiền","Khác"]
-        # input form tab1
-        if selected_tab =="Thêm giao dịch":
-            col_in, col_out = st.columns(2)
-            with col_out:
-                st.subheader("Thêm khoản chi")
-                with st.form("expense_form", clear_on_submit=True):
-                    item = st.text_input("Nội dung")
-                    amt = st.number_input("Số tiền", min_value=0, step=1000)
-                    cat = st.selectbox("Danh mục", cat_out)
-                    dt = st.date_input("Ngày chi")
-                    if st.form_submit_button("Lưu chi tiêu"):
-                        add_expense(user, item, amt, cat, dt)
-                        st.write(f"Đã lưu: -{amt:,.0f} đ")
-                        st.rerun()
-            with col_in:
-                st.subheader("Thêm khoản thu")
-                with st.form("income_form", clear_on_submit=True):
-                    src = st.text_input("Nguồn thu")
-                    amt = st.number_input("Số tiền", min_value=0, step=1000)
-                    cat = st.selectbox("Loại thu", cat_in)
-                    dt = st.date_input("Ngày thu")
-                    if st.form_submit_button("Lưu thu nhập"):
-                        add_income(user, src, amt, cat, dt)
-                        st.write(f"Đã nhận: +{amt:,.0f} đ")
-                        st.rerun()
-        if selected_tab =="Thay đổi giao dịch":
-            st.header("Thay đổi giao dịch")
-            option_delete = st.radio("Chọn loại dữ liệu muốn sửa đổi:", ["Chi tiêu", "Thu nhập"], horizontal=True,key="radio_delete_type")
-            table_name = 'expenses' if option_delete == "Chi tiêu" else 'income'
-            
-            df_delete = get_data_with_id(table_name, user)
+        # thời gian render theo tab (SQL, pandas, data_editor...) cho panel hiệu năng
+        with metrics.timed('ui.tab', tab=selected_tab):
+            # input form tab1
+            if selected_tab =="Thêm giao dịch":
+                col_in, col_out = st.columns(2)
+                with col_out:
+                    st.subheader("Thêm khoản chi")
+                    with st.form("expense_form", clear_on_submit=True):
+                        item = st.text_input("Nội dung")
+                        amt = st.number_input("Số tiền", min_value=0, step=1000)
+                        cat = st.selectbox("Danh mục", cat_out)
+                        dt = st.date_input("Ngày chi")
+                        if st.form_submit_button("Lưu chi tiêu"):
+                            repo.add_expense(user, item, amt, cat, dt)
+                            st.write(f"Đã lưu: -{amt:,.0f} đ")
+                            st.rerun()
+                with col_in:
+                    st.subheader("Thêm khoản thu")
+                    with st.form("income_form", clear_on_submit=True):
+                        src = st.text_input("Nguồn thu")
+                        amt = st.number_input("Số tiền", min_value=0, step=1000)
+                        cat = st.selectbox("Loại thu", cat_in)
+                        dt = st.date_input("Ngày thu")
+                        if st.form_submit_button("Lưu thu nhập"):
+                            repo.add_income(user, src, amt, cat, dt)
+                            st.write(f"Đã nhận: +{amt:,.0f} đ")
+                            st.rerun()
+            if selected_tab =="Thay đổi giao dịch":
+                st.header("Thay đổi giao dịch")
+                option_delete = st.radio("Chọn loại dữ liệu muốn sửa đổi:", ["Chi tiêu", "Thu nhập"], horizontal=True,key="radio_delete_type")
+                table_name = 'expenses' if option_delete == "Chi tiêu" else 'income'
             
-            if not df_delete.empty:
-                select_all=st.checkbox("Chọn tất cả",key="select_all_t4")
-                df_delete['Delete'] = False
-                if select_all:
-                    df_delete['Delete']=True
-                st.write(f"Danh sách {option_delete} (Tích vào ô 'Delete' ở cột cuối để chọn xóa):")
+                with st.expander("Bộ lọc"):
+                    f1, f2, f3, f4 = st.columns(4)
+                    date_range = f1.date_input("Khoảng ngày", value=(), key="filter_dates_t4")
+                    categories = f2.multiselect("Danh mục", repo.get_category_sums(table_name, user).index.tolist(), key="filter_cats_t4")
+                    amount_min = f3.number_input("Số tiền từ", min_value=0, step=1000, value=None, key="filter_min_t4")
+                    amount_max = f4.number_input("Số tiền đến", min_value=0, step=1000, value=None, key="filter_max_t4")
+                filters = {
+                    'date_from': date_range[0] if len(date_range) > 0 else None,
+                    'date_to': date_range[1] if len(date_range) > 1 else None,
+                    'categories': tuple(categories),
+                    'amount_min': amount_min,
+                    'amount_max': amount_max,
+                }
+
+                # con trỏ keyset của các trang đã đi qua, reset khi đổi bảng/bộ lọc
+                filter_key = repr((table_name, filters))
+                if st.session_state.get('t4_filter_key') != filter_key:
+                    st.session_state['t4_filter_key'] = filter_key
+                    st.session_state['t4_cursors'] = [0]
+                cursors = st.session_state['t4_cursors']
+                df_delete, has_next = repo.get_page(table_name, user, filters, cursors[-1])
+
+                if not df_delete.empty:
+                    select_all=st.checkbox("Chọn tất cả",key="select_all_t4")
+                    df_delete['Delete'] = select_all
+                    st.write(f"Danh sách {option_delete} - trang {len(cursors)} (Tích vào ô 'Delete' ở cột cuối để chọn xóa):")
                 
-                # Sử dụng data_editor để tạo checkbox tương tác
-                edited_df = st.data_editor(
+                    # Sử dụng data_editor để tạo checkbox tương tác
+                    with metrics.timed('ui.data_editor'):
+                        edited_df = st.data_editor(
                     
-                    df_delete,
-                    column_config={
-                        "Delete": st.column_config.CheckboxColumn(
-                            "Chọn xóa?",
-                            default=False,
-                        ),
-                        "id": st.column_config.NumberColumn("ID", disabled=True) # khóa cột id  
-                    },
-                    disabled=False, 
-                    hide_index=True,
-                    key="edit_t4"
-                )
-                
-                # execute
-                to_delete = edited_df[edited_df['Delete'] == True]
-                count_trans=len(to_delete)
-                sum_trans=to_delete['amount'].sum()
-                # read_money=ai.ask_ai_to_read_money(sum_trans)
-                if not to_delete.empty:
-                    st.warning(f"""
-                               Bạn đang chọn xóa {count_trans} giao dịch với tổng số tiền {sum_trans} VNĐ.\n
-            
-                               """)
-                                # Bằng chữ {read_money}.     
-                    if st.button("Xác nhận xóa",key="confirm_delete"):
-                        count = 0
+                            df_delete,
+                            column_config={
+                                "Delete": st.column_config.CheckboxColumn(
+                                    "Chọn xóa?",
+                                    default=False,
+                                    disabled=select_all, # chọn tất cả = chọn theo bộ lọc, không theo từng dòng
+                                ),
+                                "id": st.column_config.NumberColumn("ID", disabled=True), # khóa cột id  
+                                "owner": st.column_config.TextColumn("owner", disabled=True),
+                            },
+                            disabled=False, 
+                            hide_index=True,
+                            # version trong key: sau khi lưu, editor nhận dữ liệu mới thay vì giữ các ô đã sửa
+                            key=f"edit_t4_{filter_key}_{cursors[-1]}_{repo.get_data_version(user)}"
+                        )
 
-                        for index, row in to_delete.iterrows():
-                            del_record(table_name, row['id'], user)
-                            count += 1
-                        
-                        st.success(f"Đã xóa thành công {count} giao dịch!")
+                    if st.button("Lưu thay đổi", key="save_edit_t4"):
+                        count, errors = repo.update_records(table_name, user, edited_df, df_delete)
+                        if not errors.empty:
+                            st.error(f"Có {len(errors)} dòng không lưu được:")
+                            st.dataframe(errors, hide_index=True)
+                        else:
+                            st.success(f"Đã cập nhật {count} giao dịch.")
+                            st.rerun()
+
+                    nav_prev, nav_next = st.columns(2)
+                    if nav_prev.button("Trang trước", key="prev_t4", disabled=len(cursors) == 1):
+                        cursors.pop()
                         st.rerun()
-            else:
-                st.info("Chưa có dữ liệu để xóa.")
-        if selected_tab=="Lịch sử chi tiêu":
-            st.subheader("Lịch sử giao dịch")
-            
-            view_mode = st.radio("Xem dữ liệu:", ["Chi tiêu", "Thu nhập"], horizontal=True)
-            
-            if view_mode == "Chi tiêu":
-                if not df_expense.empty:
-                    st.dataframe(df_expense)
-                    # Biểu đồ tròn cho chi tiêu
-                    st.write("Cơ cấu chi tiêu:")
-                    st.bar_chart(df_expense.groupby("danh_muc")['so_tien'].sum())
-                else:
-                    st.info("Chưa có dữ liệu chi tiêu.")
-            else:
-                if not df_income.empty:
-                    st.dataframe(df_income)
-                    # Biểu đồ cho thu nhập
-                    st.write("Nguồn thu chính:")
-                    st.bar_chart(df_income.groupby("danh_muc")['so_tien'].sum())
+                    if nav_next.button("Trang sau", key="next_t4", disabled=not has_next):
+                        cursors.append(int(df_delete['id'].iloc[-1]))
+                        st.rerun()
+                
+                    # execute
+                    if select_all:
+                        count_trans, sum_trans = repo.get_filtered_summary(table_name, user, filters)
+                    else:
+                        to_delete = edited_df[edited_df['Delete'] == True]
+                        count_trans=len(to_delete)
+                        sum_trans=to_delete['amount'].sum()
+                    if count_trans:
+                        read_money=ai.ask_ai_to_read_money(sum_trans)
+                        st.warning(f"""
+                                   Bạn đang chọn xóa {count_trans} giao dịch với tổng số tiền {sum_trans} VNĐ.\n
+                                   Bằng chữ: {read_money} đồng.
+                                   """)
+                        if st.button("Xác nhận xóa",key="confirm_delete"):
+                            if select_all:
+                                count, total = repo.del_records_where(table_name, user, filters)
+                            else:
+                                count, total = repo.del_records(table_name, to_delete['id'].tolist(), user)
+
+                            st.success(f"Đã xóa thành công {count} giao dịch ({total:,.0f} VNĐ)!")
+                            st.rerun()
                 else:
-                    st.info("Chưa có dữ liệu thu nhập.")
-        if selected_tab=="Nhập từ file":
-            st.header("Nhập liệu từ Excel/CSV")
-            st.info("Hỗ trợ file .csv hoặc .xlsx. Dữ liệu sẽ được thêm vào bảng chi tiêu.")
-            uploaded_file = st.file_uploader("Chọn file", type=['xlsx', 'csv'],key="file_uploader_tab3")
+                    st.info("Chưa có dữ liệu để xóa.")
+            if selected_tab=="Lịch sử chi tiêu":
+                st.subheader("Lịch sử giao dịch")
+                search_text = st.text_input("Tìm giao dịch", placeholder="vd: pho, grab, luong", key="search_text")
+                if search_text:
+                    found = repo.search_transactions(user, search_text)
+                    if found.empty:
+                        st.info("Không tìm thấy giao dịch nào.")
+                    else:
+                        st.dataframe(found.drop(columns='id'), hide_index=True)
+            
+                view_mode = st.radio("Xem dữ liệu:", ["Chi tiêu", "Thu nhập", "Sổ cái"], horizontal=True)
             
-            if uploaded_file is not None:
-                try:
-                    if uploaded_file.name.endswith('.csv'):
-                        df_upload = pd.read_csv(uploaded_file)
+                if view_mode == "Chi tiêu":
+                    by_category = repo.get_category_sums('expenses', user)
+                    if not by_category.empty:
+                        # Biểu đồ tròn cho chi tiêu
+                        st.write("Cơ cấu chi tiêu:")
+                        st.bar_chart(by_category)
+                        st.write("Chi tiêu theo tháng:")
+                        st.bar_chart(repo.get_monthly_sums('expenses', user))
+                        # bảng chi tiết mới cần load toàn bộ dòng
+                        if st.checkbox("Xem bảng chi tiết", key="show_expense_table"):
+                            st.dataframe(repo.view_expenses(user))
                     else:
-                        df_upload = pd.read_excel(uploaded_file)
-
-                    # ai_used=st.button("Sử dụng AI để đọc tài liệu của bạn")
-                    selected_type = st.radio(
-                        "Menu:",
-                        ["Chọn thủ công", "Sử dụng AI"],
-                        horizontal=True, # Nằm ngang cho giống Tabs
-                        label_visibility="collapsed" 
-                        )
-                    if selected_type=="Chọn thủ công":
-                        st.dataframe(df_upload.head()) 
-
-                        st.subheader("Chọn cột để lấy dữ liệu")
-                        st.caption("Chọn cột trong file tương ứng với dữ liệu cần nhập")
-                        
-                        cols = df_upload.columns.tolist()
-                        with st.form("multiple_choice"):
-                            col1, col2, col3,col5,col6 = st.columns(5)
-                            with col1:
-                                col_user = st.selectbox("Cột Người dùng", cols,key="user_sel")
-                            with col2:
-                                col_item = st.selectbox("Cột Nội dung", cols,key="item_sel")
-                            with col3:
-                                col_amount = st.selectbox("Cột Số tiền", cols,key="amount_sel")
-                            with col5:
-                                col_date = st.selectbox("Cột ngày",cols,key="data_sel")
-                            with col6:
-                                # option_cat = st.selectbox("Danh mục:", ["Chọn chung cho tất cả bản ghi", "Lấy tên danh mục từ file"],key="radio_cat")
-                                # if option_cat == "Lấy tên danh mục từ file":
-                                col_cat = st.selectbox("Chọn cột Danh mục", cols,key="sel_cat_col")
-                                # else:
-                                #     fixed_cat = st.selectbox("Chọn danh mục chung", cat_out,key="sel_cat_fixed")
-
-                            #  import 
-                            if st.form_submit_button("Bắt đầu nhập"):
-                                count = 0
-                                #loop row
-                                for index, row in df_upload.iterrows():
-                                    try:
-                                        # current row
-                                        date_val = pd.to_datetime(row[col_date]).date()
-                                        item_val = str(row[col_item])
-                                        amount_val = float(row[col_amount])
-                                        # cat_val = str(row[col_category])
-                                        user_val = str(row[col_user])
-                                        # xử lý cat
-                                        # if option_cat == "Lấy tên danh mục từ file":
-                                        cat_val = str(row[col_cat])
-                                        # else:
-                                        #     cat_val = fixed_cat
-                                        
-                                        # function call
-                                        add_expense(user, item_val, amount_val, cat_val, date_val)
-                                        count += 1
-                                    except Exception as e:
-                                        st.error(f"Error at row {index}: {e}")
-
-                                st.success(f"Đã thêm thành công {count} giao dịch.")
-                        reload = st.button("Reload")
-                        if reload:
+                        st.info("Chưa có dữ liệu chi tiêu.")
+                elif view_mode == "Thu nhập":
+                    by_category = repo.get_category_sums('income', user)
+                    if not by_category.empty:
+                        # Biểu đồ cho thu nhập
+                        st.write("Nguồn thu chính:")
+                        st.bar_chart(by_category)
+                        st.write("Thu nhập theo tháng:")
+                        st.bar_chart(repo.get_monthly_sums('income', user))
+                        if st.checkbox("Xem bảng chi tiết", key="show_income_table"):
+                            st.dataframe(repo.view_income(user))
+                    else:
+                        st.info("Chưa có dữ liệu thu nhập.")
+                else:
+                    # sao kê: thu/chi theo ngày kèm số dư sau mỗi giao dịch
+                    ledger_dates = st.date_input("Khoảng ngày", value=(), key="ledger_dates")
+                    date_from = ledger_dates[0] if len(ledger_dates) > 0 else None
+                    date_to = ledger_dates[1] if len(ledger_dates) > 1 else None
+                    ledger_key = repr((date_from, date_to))
+                    if st.session_state.get('ledger_key') != ledger_key:
+                        st.session_state['ledger_key'] = ledger_key
+                        st.session_state['ledger_cursors'] = [None]
+                    ledger_cursors = st.session_state['ledger_cursors']
+                    df_ledger, next_cursor = repo.get_ledger(user, date_from, date_to, ledger_cursors[-1])
+                    if not df_ledger.empty:
+                        st.write(f"Sổ cái - trang {len(ledger_cursors)}:")
+                        st.dataframe(df_ledger.drop(columns='id'), hide_index=True, column_config={
+                            "so_tien": st.column_config.NumberColumn("Số tiền", format="%.0f"),
+                            "so_du": st.column_config.NumberColumn("Số dư", format="%.0f"),
+                        })
+                        l1, l2 = st.columns(2)
+                        if l1.button("Trang trước", key="ledger_prev", disabled=len(ledger_cursors) == 1):
+                            ledger_cursors.pop()
                             st.rerun()
-                    if 'ai_session' not in st.session_state:
-                        st.session_state['ai_session']= None
-                    if selected_type=="Sử dụng AI":
-                        st.caption("Mô hình AI được sử dụng: Gemini 2.5 Pro")
-                        st.caption("Lưu ý: Hiện tại bản web chưa gọi được AI, chỉ có thể sử dụng cục bộ")
-                        if st.button("Bắt đầu phân tích"):
-                            with st.spinner("Đang tải..."):
-                                csv_data = df_upload.to_csv(index=False)
-                                ai_results = ai.ask_ai_to_parse(csv_data)
-
-
-                                if ai_results:
-                                    st.session_state['ai_session'] = pd.DataFrame(ai_results)
-                                else:
-                                    st.error("Không thể phân tích")
-                        if st.session_state['ai_session'] is not None:
-                            st.write("Kết quả:")   
-                            data_read_ai = st.session_state['ai_session']
-                            edited_df = st.data_editor(data_read_ai, num_rows="dynamic")
-                            
+                        if l2.button("Trang sau", key="ledger_next", disabled=next_cursor is None):
+                            ledger_cursors.append(next_cursor)
+                            st.rerun()
+                    else:
+                        st.info("Chưa có giao dịch trong khoảng này.")
+            if selected_tab=="Nhập từ file":
+                st.header("Nhập liệu từ Excel/CSV")
+                st.info("Hỗ trợ file .csv hoặc .xlsx. Dữ liệu sẽ được thêm vào bảng chi tiêu.")
+                uploaded_file = st.file_uploader("Chọn file", type=['xlsx', 'csv'],key="file_uploader_tab3")
             
-                                    
-                            if st.button("Lưu kết quả"):
-                                count = 0
-                                for idx, row in edited_df.iterrows():
-                                # Kiểm tra column loại, cần phân biệt Thu nhập và Chi tiêu
-                                    if row.get('type') == "Thu nhập":
-                                        add_income(user, str(row['content']), float(row['amount']), str(row['category']), pd.to_datetime(row['date']).date())
-                                        count+=1
-                                    elif row.get('type') == "Chi tiêu":
-                                        add_expense(user, str(row['content']), float(row['amount']), str(row['category']), pd.to_datetime(row['date']).date())
-                                        count+=1
-                                st.success(f"Đã thêm thành công {count} giao dịch.")
+                if uploaded_file is not None:
+                    try:
+                        # chỉ đọc vài dòng đầu để chọn cột, file đầy đủ được đọc theo lô lúc nhập
+                        df_preview = file_import.read_preview(uploaded_file)
+
+                        # ai_used=st.button("Sử dụng AI để đọc tài liệu của bạn")
+                        selected_type = st.radio(
+                            "Menu:",
+                            ["Chọn thủ công", "Sử dụng AI"],
+                            horizontal=True, # Nằm ngang cho giống Tabs
+                            label_visibility="collapsed" 
+                            )
+                        if selected_type=="Chọn thủ công":
+                            st.dataframe(df_preview.head()) 
+
+                            st.subheader("Chọn cột để lấy dữ liệu")
+                            st.caption("Chọn cột trong file tương ứng với dữ liệu cần nhập")
+                        
+                            cols = df_preview.columns.tolist()
+                            with st.form("multiple_choice"):
+                                col1, col2, col3,col5,col6 = st.columns(5)
+                                with col1:
+                                    col_user = st.selectbox("Cột Người dùng", cols,key="user_sel")
+                                with col2:
+                                    col_item = st.selectbox("Cột Nội dung", cols,key="item_sel")
+                                with col3:
+                                    col_amount = st.selectbox("Cột Số tiền", cols,key="amount_sel")
+                                with col5:
+                                    col_date = st.selectbox("Cột ngày",cols,key="data_sel")
+                                with col6:
+                                    # option_cat = st.selectbox("Danh mục:", ["Chọn chung cho tất cả bản ghi", "Lấy tên danh mục từ file"],key="radio_cat")
+                                    # if option_cat == "Lấy tên danh mục từ file":
+                                    col_cat = st.selectbox("Chọn cột Danh mục", cols,key="sel_cat_col")
+                                    # else:
+                                    #     fixed_cat = st.selectbox("Chọn danh mục chung", cat_out,key="sel_cat_fixed")
+
+                                #  import 
+                                if st.form_submit_button("Bắt đầu nhập"):
+                                    progress = st.progress(0.0, text="Đang nhập...")
+                                    count, skipped, errors = repo.add_expenses_from_file(
+                                        user, uploaded_file,
+                                        {'ten': col_item, 'so_tien': col_amount, 'danh_muc': col_cat, 'ngay': col_date},
+                                        on_progress=lambda done, n: progress.progress(done, text=f"Đã nhập {n} giao dịch..."))
+                                    progress.empty()
+                                    if not errors.empty:
+                                        st.error(f"Có {len(errors)} dòng không nhập được:")
+                                        st.dataframe(errors, hide_index=True)
+
+                                    st.success(f"Đã thêm thành công {count} giao dịch, bỏ qua {skipped} giao dịch đã có.")
                             reload = st.button("Reload")
                             if reload:
-                                st.session_state['ai_session'] = None
                                 st.rerun()
-                except Exception as e:
-                    st.error(f"Lỗi đọc file: {e}")
+                        if 'ai_session' not in st.session_state:
+                            st.session_state['ai_session']= None
+                        if selected_type=="Sử dụng AI":
+                            st.caption("Mô hình AI được sử dụng: Gemini 2.5 Pro")
+                            st.caption("Lưu ý: Hiện tại bản web chưa gọi được AI, chỉ có thể sử dụng cục bộ")
+                            df_upload = file_import.read_all(uploaded_file)
+                            use_history = st.checkbox("Nhận diện nhanh theo lịch sử (chỉ gửi dòng chưa biết cho AI)", value=True, key="ai_use_history")
+                            if use_history:
+                                cols = df_upload.columns.tolist()
+                                h1, h2, h3 = st.columns(3)
+                                hist_item = h1.selectbox("Cột Nội dung", cols, key="ai_item_sel")
+                                hist_amount = h2.selectbox("Cột Số tiền", cols, key="ai_amount_sel")
+                                hist_date = h3.selectbox("Cột ngày", cols, key="ai_date_sel")
+                            if st.button("Bắt đầu phân tích"):
+                                with st.spinner("Đang tải..."):
+                                    known, rest = [], df_upload
+                                    if use_history:
+                                        known, rest = repo.label_from_history(user, df_upload, hist_item, hist_amount, hist_date)
+                                    ai_results = list(known)
+                                    if not rest.empty:
+                                        # hiển thị dần các dòng AI trả về (stream), vẽ lại bảng tối đa ~3 lần/giây
+                                        progress = st.empty()
+                                        last_render = 0
+                                        for item in ai.ask_ai_to_parse_stream(rest):
+                                            ai_results.append(item)
+                                            if time.monotonic() - last_render > AI_RENDER_INTERVAL:
+                                                last_render = time.monotonic()
+                                                progress.dataframe(pd.DataFrame(ai_results).sort_values('row', kind='stable').drop(columns='row'),
+                                                                   hide_index=True)
+                                        progress.empty()
+                                        # dòng AI không trả về giao dịch nào (kể cả sau khi gửi lại): báo để người dùng tự nhập
+                                        no_result = rest.index.difference([item['row'] for item in ai_results[len(known):]])
+                                        if len(no_result):
+                                            st.warning(f"{len(no_result)} dòng không nhận được kết quả từ AI:")
+                                            st.dataframe(rest.loc[no_result])
+
+                                    if ai_results:
+                                        st.session_state['ai_session'] = pd.DataFrame(ai_results).sort_values('row', kind='stable').drop(columns='row').reset_index(drop=True)
+                                        st.caption(f"Nhận diện theo lịch sử: {len(known)} dòng, gửi AI: {len(rest)} dòng")
+                                    else:
+                                        st.error("Không thể phân tích")
+                            if st.session_state['ai_session'] is not None:
+                                st.write("Kết quả:")   
+                                data_read_ai = st.session_state['ai_session']
+                                with metrics.timed('ui.data_editor'):
+                                    edited_df = st.data_editor(data_read_ai, num_rows="dynamic")
+                            
+            
+                                    
+                                if st.button("Lưu kết quả"):
+                                    # Kiểm tra column loại, cần phân biệt Thu nhập và Chi tiêu
+                                    df_save = edited_df.rename(columns={
+                                        'content': 'ten', 'amount': 'so_tien', 'category': 'danh_muc', 'date': 'ngay', 'type': 'loai'
+                                    }).reindex(columns=['ten', 'so_tien', 'danh_muc', 'ngay', 'loai'])
+                                    count, skipped, errors = repo.add_transactions_bulk(user, df_save)
+                                    if not errors.empty:
+                                        st.error(f"Có {len(errors)} dòng không lưu được:")
+                                        st.dataframe(errors, hide_index=True)
+                                    st.success(f"Đã thêm thành công {count} giao dịch, bỏ qua {skipped} giao dịch đã có.")
+                                reload = st.button("Reload")
+                                if reload:
+                                    st.session_state['ai_session'] = None
+                                    st.rerun()
+                    except Exception as e:
+                        st.error(f"Lỗi đọc file: {e}")
 if __name__ == '__main__':
-    init_db()
     main()
\ No newline at end of file
@@ -0,0 +1,174 @@
+import bisect
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+# Đo hiệu năng trong process: số lần gọi, histogram độ trễ, số dòng trả về, bộ đếm (cache hit/miss...).
+# timed() dùng được làm decorator hoặc context manager:
+#   @timed('db.get_page')                         with timed('ui.tab', tab=selected_tab):
+# Xuất ra file dạng Prometheus text (.prom, ghi đè) hoặc JSONL (.jsonl, mỗi lần ghi thêm 1 dòng snapshot).
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+EXPORT_INTERVAL = 15
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name, seconds, rows=None, **labels):
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = {'count': 0, 'sum': 0.0, 'rows': 0, 'buckets': [0] * len(BUCKETS)}
+        h['count'] += 1
+        h['sum'] += seconds
+        h['buckets'][bisect.bisect_left(BUCKETS, seconds)] += 1
+        if rows is not None:
+            h['rows'] += rows
+
+
+def incr(name, n=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def _count_rows(result):
+    # DataFrame/list -> len; (df, ...) như get_page/get_ledger -> len phần tử đầu; còn lại không đếm
+    if isinstance(result, tuple):
+        result = result[0] if result else None
+    if isinstance(result, (str, bytes, dict, tuple)) or not hasattr(result, '__len__'):
+        return None
+    return len(result)
+
+
+class timed:
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.rows = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start, self.rows, **self.labels)
+        # BaseException khác Exception (vd. st.rerun) là điều khiển luồng, không tính lỗi
+        if exc_type is not None and issubclass(exc_type, Exception):
+            incr('errors', op=self.name)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                observe(self.name, time.perf_counter() - start, **self.labels)
+                incr('errors', op=self.name)
+                raise
+            observe(self.name, time.perf_counter() - start, _count_rows(result), **self.labels)
+            return result
+        return wrapper
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _quantile(buckets, count, q):
+    # cận trên của bucket chứa quantile q (không nội suy); rơi vào +Inf thì lấy cận hữu hạn lớn nhất
+    target, seen = q * count, 0
+    for bound, n in zip(BUCKETS[:-1], buckets):
+        seen += n
+        if seen >= target:
+            return bound
+    return BUCKETS[-2]
+
+
+def _copy():
+    with _lock:
+        return {key: dict(h, buckets=list(h['buckets'])) for key, h in _histograms.items()}, dict(_counters)
+
+
+def snapshot():
+    # (bảng thời gian, bảng bộ đếm) cho panel admin: mỗi dòng 1 (tên, nhãn)
+    import pandas as pd
+    histograms, counters = _copy()
+    timings = pd.DataFrame([{
+        'name': name, 'labels': ','.join(f"{k}={v}" for k, v in labels), 'count': h['count'],
+        'avg_ms': h['sum'] / h['count'] * 1000, 'p50_ms': _quantile(h['buckets'], h['count'], 0.5) * 1000,
+        'p99_ms': _quantile(h['buckets'], h['count'], 0.99) * 1000, 'total_s': h['sum'], 'rows': h['rows'],
+    } for (name, labels), h in histograms.items()], columns=['name', 'labels', 'count', 'avg_ms', 'p50_ms', 'p99_ms', 'total_s', 'rows'])
+    counts = pd.DataFrame([{'name': name, 'labels': ','.join(f"{k}={v}" for k, v in labels), 'value': value}
+                           for (name, labels), value in counters.items()], columns=['name', 'labels', 'value'])
+    return timings.sort_values('total_s', ascending=False, ignore_index=True), counts.sort_values(['name', 'labels'], ignore_index=True)
+
+
+def _prom_name(name):
+    return 'expense_' + ''.join(ch if ch.isalnum() else '_' for ch in name)
+
+
+def _prom_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in items) + '}'
+
+
+def to_prometheus():
+    histograms, counters = _copy()
+    lines = []
+    for (name, labels), h in sorted(histograms.items()):
+        metric = _prom_name(name) + '_seconds'
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h['buckets']):
+            cumulative += n
+            le = '+Inf' if bound == math.inf else repr(bound)
+            lines.append(f"{metric}_bucket{_prom_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{metric}_sum{_prom_labels(labels)} {h['sum']}")
+        lines.append(f"{metric}_count{_prom_labels(labels)} {h['count']}")
+        lines.append(f"{_prom_name(name)}_rows_total{_prom_labels(labels)} {h['rows']}")
+    for (name, labels), value in sorted(counters.items()):
+        lines.append(f"{_prom_name(name)}_total{_prom_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def write(path):
+    if path.endswith('.jsonl'):
+        timings, counts = snapshot()
+        line = {'time': time.time(), 'timings': timings.to_dict('records'), 'counters': counts.to_dict('records')}
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(line, ensure_ascii=False, default=str) + '\n')
+    else:
+        # ghi file tạm rồi đổi tên: scraper không bao giờ đọc phải file ghi dở
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(to_prometheus())
+        os.replace(tmp, path)
+
+
+def start_exporter(path, interval=EXPORT_INTERVAL):
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                write(path)
+            except OSError as e:
+                print(f"Metrics export error: {e}")
+    thread = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+    thread.start()
+    return thread
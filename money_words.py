@@ -0,0 +1,70 @@
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+# Đọc số thành chữ tiếng Việt, không cần gọi AI:
+# - số 0 ở hàng chục: "lẻ" (105 -> một trăm lẻ năm)
+# - hàng đơn vị sau "mươi": 1 -> "mốt", 4 -> "tư", 5 -> "lăm"; sau "mười": 5 -> "lăm"
+# - đọc theo lớp nghìn/triệu/tỷ, lớp 0 bị bỏ qua, lớp sau lớp đầu tiên đọc đủ "không trăm"
+DIGITS = ['không', 'một', 'hai', 'ba', 'bốn', 'năm', 'sáu', 'bảy', 'tám', 'chín']
+ZERO_TENS = 'lẻ'
+
+
+def _read_triple(n, full):
+    hundreds, tens, units = n // 100, n // 10 % 10, n % 10
+    words = []
+    if hundreds or full:
+        words += [DIGITS[hundreds], 'trăm']
+    if tens == 0:
+        if units:
+            if hundreds or full:
+                words.append(ZERO_TENS)
+            words.append(DIGITS[units])
+    elif tens == 1:
+        words.append('mười')
+        if units:
+            words.append('lăm' if units == 5 else DIGITS[units])
+    else:
+        words += [DIGITS[tens], 'mươi']
+        if units:
+            words.append({1: 'mốt', 4: 'tư', 5: 'lăm'}.get(units, DIGITS[units]))
+    return words
+
+
+def _read_integer(n, full=False):
+    if n >= 10 ** 9:
+        high, low = divmod(n, 10 ** 9)
+        words = _read_integer(high, full) + ['tỷ']
+        return words + _read_integer(low, True) if low else words
+    words = []
+    for group, unit in ((n // 10 ** 6, 'triệu'), (n // 1000 % 1000, 'nghìn'), (n % 1000, '')):
+        if group:
+            words += _read_triple(group, full)
+            if unit:
+                words.append(unit)
+            full = True
+    return words
+
+
+@lru_cache(maxsize=65536)
+def _read_decimal(text):
+    value = Decimal(text)
+    if not value.is_finite():
+        raise ValueError(f"Không đọc được số: {text}")
+    sign = ['âm'] if value < 0 else []
+    integer, _, fraction = format(abs(value), 'f').partition('.')
+    fraction = fraction.rstrip('0')
+    words = sign + (_read_integer(int(integer)) or [DIGITS[0]])
+    if fraction:
+        words += ['phẩy'] + (_read_integer(int(fraction)) if not fraction.startswith('0')
+                             else [DIGITS[int(digit)] for digit in fraction])
+    sentence = ' '.join(words)
+    return sentence[0].upper() + sentence[1:]
+
+
+def read_money(amount):
+    # amount: int, float, Decimal hoặc chuỗi số ("1500000", "1,500,000")
+    text = str(amount).strip().replace(',', '').replace('_', '')
+    try:
+        return _read_decimal(text)
+    except (InvalidOperation, ValueError) as e:
+        raise ValueError(f"Không đọc được số: {amount}") from e
@@ -0,0 +1,1026 @@
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import classifier
+import file_import
+import vn_format
+from cache import cached
+from metrics import timed
+from db_reader import ReadPool
+from db_writer import DbWriter
+
+# Tầng dữ liệu: schema, đọc/ghi, tổng hợp. Không phụ thuộc Streamlit để dùng được từ UI (main.py),
+# CLI (cli.py), batch job và benchmark. Hàm public đều qua metrics.timed (số lần gọi, độ trễ, số dòng).
+DB_PATH = 'expense_db.db'
+# sharding (tùy chọn, mặc định tắt): SHARD_DIR = None -> mọi bảng nằm trong DB_PATH như cũ.
+# Đặt SHARD_DIR -> DB_PATH chỉ còn dùng cho bảng users (đăng nhập); giao dịch, rollup, FTS, classifier, data_versions
+# của mỗi owner nằm ở SHARD_DIR/shard_XXX.db theo hash(owner) % SHARD_COUNT.
+# Mỗi file có writer thread + pool đọc riêng: ghi của user ở shard khác nhau không phải xếp hàng chung 1 writer.
+# Số file cố định (SHARD_COUNT >= 1), init_db tạo + migrate hết lúc khởi động -> số thread/connection có giới hạn.
+# DB có sẵn thì chia bằng split_database() (python cli.py shard ...), không đổi layout bằng cách sửa config.
+SHARD_DIR = None
+SHARD_COUNT = 16
+# allow-list bảng giao dịch -> cột tên giao dịch; tên bảng được ghép vào f-string nên phải kiểm tra
+NAME_COLUMNS = {'expenses': 'item_name', 'income': 'source'}
+
+def check_table(table_name):
+    if table_name not in NAME_COLUMNS:
+        raise ValueError(f"Bảng không hợp lệ: {table_name}")
+    return table_name
+
+def shard_layout():
+    # ghi vào bảng settings của DB_PATH, init_db so với cấu hình hiện tại
+    if SHARD_DIR is None:
+        return 'none'
+    return f"hash:{SHARD_COUNT}"
+
+def shard_path(owner=None):
+    # file chứa dữ liệu của owner; owner=None (bảng users) hoặc không bật sharding -> DB_PATH
+    if SHARD_DIR is None or owner is None:
+        return DB_PATH
+    digest = hashlib.sha1(str(owner).encode('utf-8')).hexdigest()
+    return _shard_file(int(digest[:8], 16) % SHARD_COUNT)
+
+def _shard_file(n):
+    return os.path.join(SHARD_DIR, f"shard_{n:03d}.db")
+
+def shard_paths():
+    # mọi file đang chứa dữ liệu giao dịch (cho các việc chạy trên tất cả owner)
+    if SHARD_DIR is None:
+        return [DB_PATH]
+    return [_shard_file(n) for n in range(SHARD_COUNT)]
+
+# pool đọc + thread ghi dùng chung cả process, theo từng file DB (đổi DB_PATH/SHARD_DIR -> bộ mới)
+_resources = {}
+_resources_lock = threading.Lock()
+
+def _resource(factory, path):
+    # file shard đã được init_db tạo + migrate sẵn, ở đây chỉ mở
+    with _resources_lock:
+        key = (factory, path)
+        if key not in _resources:
+            _resources[key] = factory(path)
+        return _resources[key]
+
+def get_read_pool(owner=None):
+    # connection đọc (read-only), mỗi lần đọc mượn 1 connection; mọi lệnh ghi đi qua get_writer()
+    # owner: đọc dữ liệu của owner nào thì truyền vào để đi đúng shard
+    return _resource(ReadPool, shard_path(owner))
+
+def get_writer(owner=None):
+    # 1 thread ghi cho mỗi file DB, gom các lệnh ghi đồng thời vào 1 transaction
+    return _resource(DbWriter, shard_path(owner))
+
+# schema migrations: phần tử thứ i đưa PRAGMA user_version từ i lên i+1
+# chỉ được thêm migration mới vào cuối, không sửa migration cũ
+def _migrate_content_hash(c):
+    # cột content_hash cho chống nhập trùng + backfill mọi dòng cũ, nhập tay hay nhập file như nhau:
+    # lần xuất hiện đánh số theo thứ tự id của từng owner, đúng thứ tự _free_hashes cấp cho dòng thêm tay về sau
+    for table_name, name_col in NAME_COLUMNS.items():
+        c.execute(f"ALTER TABLE {table_name} ADD COLUMN content_hash TEXT")
+        owners = [row[0] for row in c.execute(f"SELECT DISTINCT owner FROM {table_name} WHERE owner IS NOT NULL")]
+        for owner in owners:
+            rows = c.execute(f"SELECT id, {name_col}, amount, category, date FROM {table_name} WHERE owner=? ORDER BY id",
+                             (owner,)).fetchall()
+            df = pd.DataFrame(rows, columns=['id', 'ten', 'so_tien', 'danh_muc', 'ngay'])
+            hashes, _ = _content_hashes(owner, df)
+            c.executemany(f"UPDATE {table_name} SET content_hash=? WHERE id=?", zip(hashes, df['id'].tolist()))
+        c.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table_name}_owner_hash ON {table_name}(owner, content_hash)")
+
+MIGRATIONS = [
+    # 1: bảng gốc (IF NOT EXISTS để chạy được trên DB cũ chưa có user_version)
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT
+    );
+    CREATE TABLE IF NOT EXISTS expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        owner TEXT,
+        item_name TEXT,
+        amount REAL,
+        category TEXT,
+        date DATE
+    );
+    CREATE TABLE IF NOT EXISTS income (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        owner TEXT,
+        source TEXT,
+        amount REAL,
+        category TEXT,
+        date DATE
+    );
+    -- version dữ liệu theo owner, tăng mỗi lần ghi -> key cho cache của reader
+    CREATE TABLE IF NOT EXISTS data_versions (
+        owner TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    ''',
+    # 2: index theo owner để query của 1 user không quét cả bảng
+    '''
+    CREATE INDEX IF NOT EXISTS idx_expenses_owner_date ON expenses(owner, date);
+    CREATE INDEX IF NOT EXISTS idx_expenses_owner_category ON expenses(owner, category);
+    CREATE INDEX IF NOT EXISTS idx_income_owner_date ON income(owner, date);
+    CREATE INDEX IF NOT EXISTS idx_income_owner_category ON income(owner, category);
+    ''',
+    # 3: bảng tổng hợp theo tháng/danh mục, trigger cập nhật trong cùng transaction với bảng gốc
+    '''
+    CREATE TABLE IF NOT EXISTS monthly_rollups (
+        owner TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        month TEXT NOT NULL,
+        category TEXT NOT NULL,
+        total REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (owner, table_name, month, category)
+    );
+    ''' + ''.join('''
+    CREATE TRIGGER IF NOT EXISTS trg_{t}_rollup_insert AFTER INSERT ON {t} BEGIN
+        INSERT INTO monthly_rollups(owner, table_name, month, category, total, count)
+        VALUES (NEW.owner, '{t}', COALESCE(substr(NEW.date, 1, 7), ''), COALESCE(NEW.category, ''), COALESCE(NEW.amount, 0), 1)
+        ON CONFLICT(owner, table_name, month, category)
+        DO UPDATE SET total = total + excluded.total, count = count + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_{t}_rollup_delete AFTER DELETE ON {t} BEGIN
+        UPDATE monthly_rollups SET total = total - COALESCE(OLD.amount, 0), count = count - 1
+        WHERE owner = OLD.owner AND table_name = '{t}'
+          AND month = COALESCE(substr(OLD.date, 1, 7), '') AND category = COALESCE(OLD.category, '');
+        DELETE FROM monthly_rollups
+        WHERE owner = OLD.owner AND table_name = '{t}'
+          AND month = COALESCE(substr(OLD.date, 1, 7), '') AND category = COALESCE(OLD.category, '') AND count <= 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_{t}_rollup_update AFTER UPDATE OF owner, amount, category, date ON {t} BEGIN
+        UPDATE monthly_rollups SET total = total - COALESCE(OLD.amount, 0), count = count - 1
+        WHERE owner = OLD.owner AND table_name = '{t}'
+          AND month = COALESCE(substr(OLD.date, 1, 7), '') AND category = COALESCE(OLD.category, '');
+        DELETE FROM monthly_rollups
+        WHERE owner = OLD.owner AND table_name = '{t}'
+          AND month = COALESCE(substr(OLD.date, 1, 7), '') AND category = COALESCE(OLD.category, '') AND count <= 0;
+        INSERT INTO monthly_rollups(owner, table_name, month, category, total, count)
+        VALUES (NEW.owner, '{t}', COALESCE(substr(NEW.date, 1, 7), ''), COALESCE(NEW.category, ''), COALESCE(NEW.amount, 0), 1)
+        ON CONFLICT(owner, table_name, month, category)
+        DO UPDATE SET total = total + excluded.total, count = count + 1;
+    END;
+    INSERT INTO monthly_rollups(owner, table_name, month, category, total, count)
+    SELECT owner, '{t}', COALESCE(substr(date, 1, 7), ''), COALESCE(category, ''), SUM(COALESCE(amount, 0)), COUNT(*)
+    FROM {t} WHERE owner IS NOT NULL GROUP BY 1, 3, 4;
+    '''.format(t=t) for t in ('expenses', 'income')),
+    # 4: index cho keyset pagination (WHERE owner=? AND id>? ORDER BY id)
+    '''
+    CREATE INDEX IF NOT EXISTS idx_expenses_owner_id ON expenses(owner, id);
+    CREATE INDEX IF NOT EXISTS idx_income_owner_id ON income(owner, id);
+    ''',
+    # 5: bộ phân loại danh mục học từ lịch sử (classifier.py)
+    '''
+    CREATE TABLE IF NOT EXISTS classifier_tokens (
+        owner TEXT NOT NULL,
+        token TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (owner, token, table_name, category)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS classifier_labels (
+        owner TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        docs INTEGER NOT NULL DEFAULT 0,
+        tokens INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (owner, table_name, category)
+    ) WITHOUT ROWID;
+    -- tách token phải làm bằng Python: owner có lịch sử trước migration sẽ được train lúc dùng lần đầu
+    CREATE TABLE IF NOT EXISTS classifier_pending (owner TEXT PRIMARY KEY);
+    INSERT OR IGNORE INTO classifier_pending(owner)
+    SELECT owner FROM expenses WHERE owner IS NOT NULL UNION SELECT owner FROM income WHERE owner IS NOT NULL;
+    ''',
+    # 6: hash nội dung + unique index, nhập lại file trùng thì bỏ qua dòng đã có
+    _migrate_content_hash,
+    # 7: tìm kiếm full-text theo tên giao dịch, rowid = id của bảng gốc
+    # remove_diacritics bỏ dấu (phở = pho) nhưng không đổi đ -> d nên trigger tự thay trước khi index;
+    # cột owner lưu hex(owner) thành 1 token để FTS lọc luôn theo user thay vì khớp cả bảng rồi mới lọc
+    ''.join('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {t}_fts USING fts5(
+        name, owner, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    );
+    CREATE TRIGGER IF NOT EXISTS trg_{t}_fts_insert AFTER INSERT ON {t} BEGIN
+        INSERT INTO {t}_fts(rowid, name, owner)
+        VALUES (NEW.id, replace(replace(COALESCE(NEW.{n}, ''), 'đ', 'd'), 'Đ', 'D'), hex(NEW.owner));
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_{t}_fts_delete AFTER DELETE ON {t} BEGIN
+        DELETE FROM {t}_fts WHERE rowid = OLD.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_{t}_fts_update AFTER UPDATE OF owner, {n} ON {t} BEGIN
+        UPDATE {t}_fts SET name = replace(replace(COALESCE(NEW.{n}, ''), 'đ', 'd'), 'Đ', 'D'), owner = hex(NEW.owner)
+        WHERE rowid = NEW.id;
+    END;
+    INSERT INTO {t}_fts(rowid, name, owner)
+    SELECT id, replace(replace(COALESCE({n}, ''), 'đ', 'd'), 'Đ', 'D'), hex(owner) FROM {t};
+    '''.format(t=t, n=n) for t, n in NAME_COLUMNS.items()),
+    # 8: cấu hình lưu trong DB (vd. layout shard mà dữ liệu đang dùng)
+    '''
+    CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    ''',
+]
+
+# các query chạy mỗi lần rerun, không được full scan
+HOT_QUERIES = [
+    "SELECT item_name, category, date, amount FROM expenses WHERE owner=?",
+    "SELECT source, category, date, amount FROM income WHERE owner=?",
+    "SELECT id, owner, item_name, amount, category, date FROM expenses WHERE owner=?",
+    "SELECT id, owner, source, amount, category, date FROM income WHERE owner=?",
+    "DELETE FROM expenses WHERE owner=? AND id IN (?,?)",
+    "DELETE FROM income WHERE owner=? AND id IN (?,?)",
+    "SELECT version FROM data_versions WHERE owner=?",
+    "SELECT id, owner, item_name, amount, category, date FROM expenses WHERE owner=? AND id>? ORDER BY id LIMIT ?",
+    "SELECT id, owner, source, amount, category, date FROM income WHERE owner=? AND id>? ORDER BY id LIMIT ?",
+    "SELECT table_name, SUM(total) FROM monthly_rollups WHERE owner=? GROUP BY table_name",
+    "SELECT category, SUM(total) FROM monthly_rollups WHERE owner=? AND table_name=? GROUP BY category",
+    "SELECT month, SUM(total) FROM monthly_rollups WHERE owner=? AND table_name=? GROUP BY month",
+]
+
+def _statements(script):
+    # tách script thành từng lệnh (trigger có ';' bên trong BEGIN ... END)
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ''
+
+def migrate(c):
+    # chạy như 1 job của writer: đọc user_version và đổi schema trong cùng transaction
+    # (BEGIN IMMEDIATE), nên 2 process khởi động cùng lúc không chạy trùng migration
+    version = c.execute('PRAGMA user_version').fetchone()[0]
+    for target, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        # migration cần tính bằng Python (vd. hash) là hàm nhận cursor
+        if callable(script):
+            script(c)
+        else:
+            for statement in _statements(script):
+                c.execute(statement)
+        c.execute(f'PRAGMA user_version = {target}')
+    return c.execute('PRAGMA user_version').fetchone()[0]
+
+def check_query_plans(conn):
+    # trả về các hot query đang full scan kèm plan của nó
+    slow = []
+    for query in HOT_QUERIES:
+        plan = conn.execute('EXPLAIN QUERY PLAN ' + query, ('',) * query.count('?')).fetchall()
+        details = [row[-1] for row in plan]
+        if any(detail.startswith('SCAN') for detail in details):
+            slow.append((query, details))
+    return slow
+
+def _stored_layout(c):
+    row = c.execute("SELECT value FROM settings WHERE key='shard_layout'").fetchone()
+    return row[0] if row else 'none'
+
+def _check_layout(c):
+    # chạy app với cấu hình shard khác layout của dữ liệu thì sẽ không thấy dữ liệu cũ -> báo lỗi thay vì chạy tiếp
+    stored, layout = _stored_layout(c), shard_layout()
+    if stored == layout:
+        return
+    if stored == 'none' and not any(c.execute(f"SELECT 1 FROM {t} LIMIT 1").fetchone() for t in NAME_COLUMNS):
+        # DB mới, chưa có giao dịch: bật sharding ngay từ đầu
+        c.execute("INSERT OR REPLACE INTO settings(key, value) VALUES ('shard_layout', ?)", (layout,))
+        return
+    hint = "chia DB có sẵn bằng: python cli.py --shard-dir ... shard" if stored == 'none' else "đặt SHARD_DIR/SHARD_COUNT đúng như lúc chia"
+    raise RuntimeError(f"{DB_PATH} đang dùng layout shard '{stored}', cấu hình hiện tại là '{layout}': {hint}")
+
+def migrate_all():
+    # migrate DB_PATH rồi mọi file shard (tạo file nếu chưa có); trả về schema version
+    # layout shard được kiểm tra trước khi tạo shard: cấu hình sai không để lại file shard rỗng
+    if SHARD_DIR is not None:
+        if SHARD_COUNT < 1:
+            raise ValueError(f"SHARD_COUNT phải >= 1, đang là {SHARD_COUNT}")
+        os.makedirs(SHARD_DIR, exist_ok=True)
+    version = get_writer().run(migrate)
+    get_writer().run(_check_layout)
+    if SHARD_DIR is not None:
+        # tạo + migrate mọi shard trước khi pool đọc (mode=ro) kết nối tới
+        for path in shard_paths():
+            _resource(DbWriter, path).run(migrate)
+    return version
+
+@timed('repo.init_db')
+def init_db():
+    # CHỈ MỘT NGƯỜI ĐƯỢC TẠO BẢNG 1 LÚC: migration chạy trên thread ghi
+    migrate_all()
+    with get_read_pool().connection() as conn:
+        for query, details in check_query_plans(conn):
+            print(f"Query plan warning: {query} -> {details}")
+
+def _bump_version(c, owner):
+    # gọi trong cùng transaction với lệnh ghi
+    c.execute('INSERT INTO data_versions(owner, version) VALUES (?, 1) '
+              'ON CONFLICT(owner) DO UPDATE SET version = version + 1', (owner,))
+
+@timed('repo.get_data_version')
+def get_data_version(owner):
+    with get_read_pool(owner).connection() as conn:
+        row = conn.execute('SELECT version FROM data_versions WHERE owner=?', (owner,)).fetchone()
+        return row[0] if row else 0
+
+# encrypt password
+def make_hashes(password):
+    return hashlib.sha256(str.encode(password)).hexdigest()
+
+
+def check_hashes(password, hashed_text):
+    if make_hashes(password) == hashed_text:
+        return True
+    return False
+
+
+# main funct
+
+# tạo user
+@timed('repo.create_user')
+def create_user(username, password):
+    def write(c):
+        c.execute('INSERT INTO users(username, password) VALUES (?,?)',
+                  (username, make_hashes(password)))
+    try:
+        get_writer().run(write)
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+# đăng nhập cho user
+@timed('repo.login_user')
+def login_user(username, password):
+    # đọc qua pool (read-only), mỗi lần đăng nhập mượn 1 connection
+    with get_read_pool().connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT * FROM users WHERE username =? AND password = ?',
+                  (username, make_hashes(password)))
+        data = c.fetchall()
+        return data
+
+
+# funct expenses
+def _insert_one(c, table_name, owner, name, amount, category, date):
+    # dòng nhập tay cũng có content_hash: nhập lại sao kê có đúng giao dịch này thì bỏ qua
+    row = pd.DataFrame({'ten': [name], 'so_tien': [amount], 'danh_muc': [category], 'ngay': [date]})
+    c.execute(f"INSERT INTO {table_name}(owner, {NAME_COLUMNS[table_name]}, amount, category, date, content_hash) "
+              "VALUES (?,?,?,?,?,?)", (owner, name, amount, category, date, _free_hashes(c, table_name, owner, row)[0]))
+
+@timed('repo.add_expense')
+def add_expense(owner, expense_name, amount, category, date):
+    def write(c):
+        _insert_one(c, 'expenses', owner, expense_name, amount, category, date)
+        classifier.learn(c, owner, 'expenses', [expense_name], [category])
+        _bump_version(c, owner)
+    get_writer(owner).run(write)
+
+@timed('repo.add_income')
+def add_income(owner, income_name, amount, category, date):
+    def write(c):
+        _insert_one(c, 'income', owner, income_name, amount, category, date)
+        classifier.learn(c, owner, 'income', [income_name], [category])
+        _bump_version(c, owner)
+    get_writer(owner).run(write)
+
+# cache pickle + copy frame ở mỗi lần hit nên trả về dtype gọn: chuỗi Arrow, danh mục/owner
+# dạng category (mỗi giá trị lưu 1 lần), ngày datetime64 parse 1 lần lúc đọc
+COMPACT_DTYPES = {
+    'ten': 'string[pyarrow]', 'item_name': 'string[pyarrow]', 'source': 'string[pyarrow]',
+    'content_hash': 'string[pyarrow]', 'danh_muc': 'category', 'category': 'category', 'owner': 'category',
+}
+
+def _compact_frame(df):
+    df = df.astype({col: dtype for col, dtype in COMPACT_DTYPES.items() if col in df.columns})
+    for col in ('ngay', 'date'):
+        if col in df.columns:
+            df[col] = vn_format.parse_dates(df[col])
+    return df
+
+def _read_view(table_name, user):
+    with get_read_pool(user).connection() as conn:
+        return _compact_frame(pd.read_sql_query(
+            f"SELECT {NAME_COLUMNS[table_name]} as ten, category as danh_muc, date as ngay, amount as so_tien FROM {table_name} WHERE owner=?",
+            conn, params=(user,)))
+
+# cache theo (user, version): ghi của user nào chỉ làm mới cache của user đó
+@cached
+def _view_expenses(user, version):
+    return _read_view('expenses', user)
+
+@cached
+def _view_income(user, version):
+    return _read_view('income', user)
+
+@timed('repo.view_expenses')
+def view_expenses(user):
+    return _view_expenses(user, get_data_version(user))
+
+@timed('repo.view_income')
+def view_income(user):
+    return _view_income(user, get_data_version(user))
+
+# aggregation: đọc từ monthly_rollups (vài trăm dòng/user) thay vì bảng gốc
+@cached
+def _get_totals(user, version):
+    with get_read_pool(user).connection() as conn:
+        totals = dict(conn.execute("SELECT table_name, SUM(total) FROM monthly_rollups WHERE owner=? GROUP BY table_name",
+                                   (user,)).fetchall())
+        return totals.get('income', 0), totals.get('expenses', 0)
+
+@cached
+def _get_category_sums(table_name, user, version):
+    with get_read_pool(user).connection() as conn:
+        df = pd.read_sql_query("SELECT category as danh_muc, SUM(total) as so_tien FROM monthly_rollups "
+                               "WHERE owner=? AND table_name=? GROUP BY category", conn, params=(user, table_name))
+        return df.set_index('danh_muc')['so_tien']
+
+@cached
+def _get_monthly_sums(table_name, user, version):
+    with get_read_pool(user).connection() as conn:
+        df = pd.read_sql_query("SELECT month as thang, SUM(total) as so_tien FROM monthly_rollups "
+                               "WHERE owner=? AND table_name=? GROUP BY month ORDER BY month", conn, params=(user, table_name))
+        return df.set_index('thang')['so_tien']
+
+@timed('repo.get_totals')
+def get_totals(user):
+    # (tổng thu, tổng chi)
+    return _get_totals(user, get_data_version(user))
+
+@timed('repo.get_category_sums')
+def get_category_sums(table_name, user):
+    return _get_category_sums(table_name, user, get_data_version(user))
+
+@timed('repo.get_monthly_sums')
+def get_monthly_sums(table_name, user):
+    return _get_monthly_sums(table_name, user, get_data_version(user))
+
+# rollup maintenance: tính lại monthly_rollups từ bảng gốc
+ROLLUP_KEYS = ['owner', 'table_name', 'month', 'category']
+
+def _rollup_query(table_name, where=''):
+    return (f"SELECT owner, '{table_name}' as table_name, COALESCE(substr(date, 1, 7), '') as month, "
+            f"COALESCE(category, '') as category, SUM(COALESCE(amount, 0)) as total, COUNT(*) as count "
+            f"FROM {table_name} WHERE owner IS NOT NULL {where} GROUP BY 1, 3, 4")
+
+@timed('repo.rebuild_rollups')
+def rebuild_rollups(owner=None):
+    where, params = ('AND owner=?', (owner,)) if owner else ('', ())
+    def write(c):
+        c.execute(f"DELETE FROM monthly_rollups WHERE 1 {where}", params)
+        for table_name in NAME_COLUMNS:
+            c.execute(f"INSERT INTO monthly_rollups(owner, table_name, month, category, total, count) "
+                      f"{_rollup_query(table_name, where)}", params)
+        if owner:
+            _bump_version(c, owner)
+        else:
+            c.execute("UPDATE data_versions SET version = version + 1")
+    # owner=None: chạy lần lượt trên mọi shard
+    for writer in [get_writer(owner)] if owner else [_resource(DbWriter, path) for path in shard_paths()]:
+        writer.run(write)
+
+def _concat_frames(frames):
+    # bỏ frame rỗng (shard chưa có dữ liệu) trước khi concat: pandas cảnh báo FutureWarning khi ghép frame rỗng;
+    # toàn rỗng thì giữ 1 frame để còn tên cột
+    return pd.concat([frame for frame in frames if not frame.empty] or frames[:1], ignore_index=True)
+
+@timed('repo.verify_rollups')
+def verify_rollups(owner=None):
+    # trả về các nhóm lệch giữa monthly_rollups và bảng gốc (rỗng = khớp)
+    where, params = ('AND owner=?', (owner,)) if owner else ('', ())
+    expected, actual = [], []
+    for pool in [get_read_pool(owner)] if owner else [_resource(ReadPool, path) for path in shard_paths()]:
+        with pool.connection() as conn:
+            expected.append(pd.read_sql_query(' UNION ALL '.join(_rollup_query(table_name, where) for table_name in NAME_COLUMNS),
+                                              conn, params=params * len(NAME_COLUMNS)))
+            actual.append(pd.read_sql_query(f"SELECT owner, table_name, month, category, total, count FROM monthly_rollups WHERE 1 {where}",
+                                            conn, params=params))
+    if not expected:
+        return pd.DataFrame(columns=ROLLUP_KEYS)
+    expected, actual = _concat_frames(expected), _concat_frames(actual)
+    merged = expected.merge(actual, on=ROLLUP_KEYS, how='outer', suffixes=('_expected', '_actual'))
+    values = ['total_expected', 'total_actual', 'count_expected', 'count_actual']
+    merged[values] = merged[values].astype(float).fillna(0)
+    ok = ((merged['total_expected'] - merged['total_actual']).abs() < 0.005) & (merged['count_expected'] == merged['count_actual'])
+    return merged[~ok].reset_index(drop=True)
+
+# SQLite giới hạn số tham số bind mỗi câu lệnh (999 ở bản cũ)
+DELETE_CHUNK_SIZE = 500
+
+@timed('repo.del_records')
+def del_records(table_name, ids, owner):
+    # xóa nhiều id trong 1 transaction, trả về (số dòng đã xóa, tổng tiền đã xóa)
+    check_table(table_name)
+    ids = [int(record_id) for record_id in ids]
+    def write(c):
+        count, total = 0, 0
+        for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+            chunk = ids[start:start + DELETE_CHUNK_SIZE]
+            marks = ','.join('?' * len(chunk))
+            rows = c.execute(f"SELECT {NAME_COLUMNS[table_name]}, category FROM {table_name} WHERE owner=? AND id IN ({marks})",
+                             (owner, *chunk)).fetchall()
+            classifier.unlearn(c, owner, table_name, [r[0] for r in rows], [r[1] for r in rows])
+            chunk_count, chunk_total = c.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM {table_name} WHERE owner=? AND id IN ({marks})",
+                (owner, *chunk)).fetchone()
+            c.execute(f"DELETE FROM {table_name} WHERE owner=? AND id IN ({marks})", (owner, *chunk))
+            count += chunk_count
+            total += chunk_total
+        if count:
+            _bump_version(c, owner)
+        return count, total
+    return get_writer(owner).run(write)
+
+def del_record(table_name, record_id, owner):
+    return del_records(table_name, [record_id], owner)
+
+def _row_columns(table_name):
+    # cột hiện cho người dùng (data_editor): không lấy content_hash
+    return f"id, owner, {NAME_COLUMNS[table_name]}, amount, category, date"
+
+@timed('repo.get_data_with_id')
+def get_data_with_id(table_name, owner):
+    with get_read_pool(owner).connection() as conn:
+        table_name = check_table(table_name)
+        query = f"SELECT {_row_columns(table_name)} FROM {table_name} WHERE owner=?"
+        return _compact_frame(pd.read_sql_query(query, conn, params=(owner,)))
+
+# editor: phân trang keyset theo id, bộ lọc đẩy xuống SQL
+# filters: dict date_from, date_to, categories, amount_min, amount_max (None/rỗng = bỏ qua)
+PAGE_SIZE = 200
+
+def _filter_clause(owner, filters):
+    clauses, params = ['owner=?'], [owner]
+    if filters.get('date_from'):
+        clauses.append('date >= ?')
+        params.append(str(filters['date_from']))
+    if filters.get('date_to'):
+        clauses.append('date <= ?')
+        params.append(str(filters['date_to']))
+    if filters.get('categories'):
+        clauses.append(f"category IN ({','.join('?' * len(filters['categories']))})")
+        params.extend(filters['categories'])
+    if filters.get('amount_min') is not None:
+        clauses.append('amount >= ?')
+        params.append(filters['amount_min'])
+    if filters.get('amount_max') is not None:
+        clauses.append('amount <= ?')
+        params.append(filters['amount_max'])
+    return ' AND '.join(clauses), params
+
+@cached
+def _get_page(table_name, owner, filters, after_id, page_size, version):
+    with get_read_pool(owner).connection() as conn:
+        where, params = _filter_clause(owner, filters)
+        # lấy dư 1 dòng để biết còn trang sau hay không
+        df = pd.read_sql_query(f"SELECT {_row_columns(table_name)} FROM {table_name} WHERE {where} AND id > ? ORDER BY id LIMIT ?",
+                               conn, params=(*params, after_id, page_size + 1))
+        return df.head(page_size), len(df) > page_size
+
+@cached
+def _get_filtered_summary(table_name, owner, filters, version):
+    with get_read_pool(owner).connection() as conn:
+        where, params = _filter_clause(owner, filters)
+        count, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM {table_name} WHERE {where}", params).fetchone()
+        return count, total
+
+@timed('repo.get_page')
+def get_page(table_name, owner, filters, after_id=0, page_size=PAGE_SIZE):
+    # trả về (df trang hiện tại, còn trang sau?)
+    return _get_page(check_table(table_name), owner, filters, after_id, page_size, get_data_version(owner))
+
+@timed('repo.get_filtered_summary')
+def get_filtered_summary(table_name, owner, filters):
+    # (số dòng, tổng tiền) khớp bộ lọc, không load dòng nào
+    return _get_filtered_summary(check_table(table_name), owner, filters, get_data_version(owner))
+
+@timed('repo.del_records_where')
+def del_records_where(table_name, owner, filters):
+    # "Chọn tất cả": xóa theo điều kiện lọc thay vì liệt kê id
+    check_table(table_name)
+    where, params = _filter_clause(owner, filters)
+    def write(c):
+        count, total = c.execute(f"SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM {table_name} WHERE {where}", params).fetchone()
+        rows = c.execute(f"SELECT {NAME_COLUMNS[table_name]}, category FROM {table_name} WHERE {where}", params).fetchall()
+        classifier.unlearn(c, owner, table_name, [r[0] for r in rows], [r[1] for r in rows])
+        c.execute(f"DELETE FROM {table_name} WHERE {where}", params)
+        if count:
+            _bump_version(c, owner)
+        return count, total
+    return get_writer(owner).run(write)
+
+# editor: ghi lại các ô đã sửa
+EDIT_COLUMNS = ['amount', 'category', 'date']
+
+@timed('repo.update_records')
+def update_records(table_name, owner, edited_df, original_df):
+    # so edited_df với trang đã load theo id, chỉ UPDATE các ô thay đổi trong 1 transaction
+    # trả về (số dòng đã sửa, bảng lỗi); trigger rollup chạy theo UPDATE OF amount, category, date
+    db_columns = [NAME_COLUMNS[check_table(table_name)]] + EDIT_COLUMNS
+    frame_columns = ['ten', 'so_tien', 'danh_muc', 'ngay']
+    before = original_df.set_index('id')[db_columns].set_axis(frame_columns, axis=1)
+    after = edited_df.set_index('id')[db_columns].set_axis(frame_columns, axis=1).reindex(before.index)
+    changed = after.ne(before) & ~(after.isna() & before.isna())
+    changed = changed[changed.any(axis=1)]
+    if changed.empty:
+        return 0, pd.DataFrame({'dong': [], 'loi': []})
+
+    # chỉ chuẩn hóa/kiểm tra ô người dùng sửa: dòng cũ có số tiền lẻ hoặc ngày NULL vẫn sửa được tên/danh mục
+    rows = after.loc[changed.index]
+    amount = vn_format.parse_amounts(rows.loc[changed['so_tien'], 'so_tien']).abs()
+    dates = vn_format.parse_dates(rows.loc[changed['ngay'], 'ngay'])
+    reasons = pd.Series('', index=rows.index)
+    reasons[amount.index[amount.isna()]] += 'Số tiền không hợp lệ (phải là số đồng nguyên). '
+    reasons[dates.index[dates.isna()]] += 'Ngày không hợp lệ. '
+    rejected = reasons != ''
+    errors = pd.DataFrame({'dong': rows.index[rejected], 'loi': reasons[rejected].str.strip().values})
+    changed = changed[~rejected]
+    values = {
+        'ten': rows.loc[changed.index[changed['ten']], 'ten'].astype(str),
+        'so_tien': amount.reindex(changed.index[changed['so_tien']]).astype('int64'),
+        'danh_muc': rows.loc[changed.index[changed['danh_muc']], 'danh_muc'].astype(str),
+        'ngay': dates.reindex(changed.index[changed['ngay']]).dt.strftime('%Y-%m-%d'),
+    }
+    def write(c):
+        for col, db_col in zip(frame_columns, db_columns):
+            c.executemany(f"UPDATE {table_name} SET {db_col}=? WHERE id=? AND owner=?",
+                          [(value, int(record_id), owner) for record_id, value in zip(values[col].index, values[col].tolist())])
+        # đổi tên/danh mục: classifier quên cặp cũ, học cặp mới
+        relabeled = changed.index[changed['ten'] | changed['danh_muc']]
+        new_labels = before.loc[relabeled, ['ten', 'danh_muc']].astype(object)
+        for col in ('ten', 'danh_muc'):
+            new_labels.loc[values[col].index, col] = values[col]
+        classifier.unlearn(c, owner, table_name, before.loc[relabeled, 'ten'].tolist(), before.loc[relabeled, 'danh_muc'].tolist())
+        classifier.learn(c, owner, table_name, new_labels['ten'].tolist(), new_labels['danh_muc'].tolist())
+        if not changed.empty:
+            _bump_version(c, owner)
+    get_writer(owner).run(write)
+    return len(changed), errors
+
+# sổ cái: thu (+) và chi (-) gộp bằng UNION ALL, số dư lũy kế bằng window function trong SQLite
+# thứ tự (ngay, loai, id): id của 2 bảng có thể trùng nên thêm loai để thứ tự luôn xác định
+# con trỏ trang = (ngay, loai, id, so_du) của dòng cuối trang trước: trang sau chỉ cộng tiếp từ so_du,
+# không phải tính lại từ đầu lịch sử
+LEDGER_QUERY = """
+WITH ledger AS (
+    SELECT id, 'Thu nhập' AS loai, source AS ten, category AS danh_muc, COALESCE(date, '') AS ngay,
+           COALESCE(amount, 0) AS so_tien FROM income WHERE {where}
+    UNION ALL
+    SELECT id, 'Chi tiêu', item_name, category, COALESCE(date, ''), -COALESCE(amount, 0) FROM expenses WHERE {where}
+)
+SELECT id, loai, ten, danh_muc, ngay, so_tien, ? + SUM(so_tien) OVER (ORDER BY ngay, loai, id) AS so_du
+FROM ledger WHERE (ngay, loai, id) > (?, ?, ?)
+ORDER BY ngay, loai, id LIMIT ?
+"""
+
+def _ledger_where(owner, date_from, date_to):
+    clauses, params = ['owner=?'], [owner]
+    if date_from:
+        clauses.append('date >= ?')
+        params.append(str(date_from))
+    if date_to:
+        clauses.append('date <= ?')
+        params.append(str(date_to))
+    return ' AND '.join(clauses), params
+
+@cached
+def _get_ledger(owner, date_from, date_to, after, page_size, version):
+    with get_read_pool(owner).connection() as conn:
+        if after is None:
+            # số dư đầu kỳ: mọi giao dịch trước date_from
+            opening = 0
+            if date_from:
+                opening = conn.execute(
+                    "SELECT (SELECT COALESCE(SUM(amount), 0) FROM income WHERE owner=? AND date < ?) - "
+                    "(SELECT COALESCE(SUM(amount), 0) FROM expenses WHERE owner=? AND date < ?)",
+                    (owner, str(date_from), owner, str(date_from))).fetchone()[0]
+            after = ('', '', 0, opening)
+        where, params = _ledger_where(owner, date_from, date_to)
+        ngay, loai, last_id, balance = after
+        df = pd.read_sql_query(LEDGER_QUERY.format(where=where), conn,
+                               params=(*params, *params, balance, ngay, loai, last_id, page_size + 1))
+    page = df.head(page_size)
+    cursor = None
+    if len(df) > page_size:
+        last = page.iloc[-1]
+        cursor = (last['ngay'], last['loai'], int(last['id']), float(last['so_du']))
+    return page, cursor
+
+@timed('repo.get_ledger')
+def get_ledger(owner, date_from=None, date_to=None, after=None, page_size=PAGE_SIZE):
+    # trả về (df trang hiện tại, con trỏ trang sau hoặc None); so_tien có dấu, so_du là số dư lũy kế
+    return _get_ledger(owner, date_from, date_to, after, page_size, get_data_version(owner))
+
+# tìm kiếm theo tên: FTS5, từ cuối khớp theo tiền tố ("pho ha" khớp "Phở Hà Nội"), xếp theo bm25
+SEARCH_LIMIT = 100
+
+def _match_query(owner, text):
+    words = re.findall(r'\w+', str(text).replace('đ', 'd').replace('Đ', 'D'))
+    if not words:
+        return ''
+    # mỗi từ để trong "..." để FTS không hiểu nhầm thành toán tử (AND, OR, NOT, NEAR)
+    owner_token = str(owner).encode().hex().upper()
+    return f'owner : "{owner_token}" AND ' + ' AND '.join(f'name : "{word}"*' for word in words)
+
+@timed('repo.search_transactions')
+def search_transactions(owner, text, limit=SEARCH_LIMIT):
+    # trả về các giao dịch của owner khớp text, tốt nhất trước (cột loai, id, ten, danh_muc, ngay, so_tien)
+    match = _match_query(owner, text)
+    if not match:
+        return pd.DataFrame(columns=['loai', 'id', 'ten', 'danh_muc', 'ngay', 'so_tien'])
+    table_types = {table_name: type_name for type_name, table_name in TYPE_TABLES.items()}
+    query = ' UNION ALL '.join(
+        f"SELECT '{table_types[t]}' AS loai, t.id, t.{n} AS ten, t.category AS danh_muc, t.date AS ngay, t.amount AS so_tien, "
+        f"bm25({t}_fts, 1.0, 0.0) AS rank FROM {t}_fts f JOIN {t} t ON t.id = f.rowid WHERE {t}_fts MATCH ? AND t.owner = ?"
+        for t, n in NAME_COLUMNS.items())
+    with get_read_pool(owner).connection() as conn:
+        df = pd.read_sql_query(f"{query} ORDER BY rank LIMIT ?", conn, params=(match, owner) * len(NAME_COLUMNS) + (limit,))
+    return df.drop(columns='rank')
+
+# bulk import
+# df đầu vào dùng cùng tên cột với view_expenses/view_income: ten, so_tien, danh_muc, ngay
+# (thêm cột loai = "Thu nhập"/"Chi tiêu" cho add_transactions_bulk)
+BULK_CHUNK_SIZE = 5000
+HASH_CHUNK_SIZE = 500
+TYPE_TABLES = {'Chi tiêu': 'expenses', 'Thu nhập': 'income'}
+
+@timed('repo.prepare_records')
+def prepare_records(df):
+    # số tiền/ngày kiểu VN ("1.234.567 đ", "(120.000)", dd/mm/yyyy) chuẩn hóa theo cả cột trong vn_format
+    # số tiền lưu số dương (như label_from_history/AI): bảng đích đã quyết định thu hay chi, dấu "-"/"(...)"
+    # của sao kê chỉ cho biết đó là khoản ghi nợ
+    normalized, rejected = vn_format.normalize(df[['so_tien', 'ngay']])
+    amount, dates = normalized['so_tien'], normalized['ngay']
+    clean = pd.DataFrame({
+        'ten': df['ten'].astype(str),
+        'so_tien': amount.abs(),
+        'danh_muc': df['danh_muc'].astype(str),
+        'ngay': dates.dt.strftime('%Y-%m-%d'),
+    }, index=df.index)
+
+    reasons = pd.Series('', index=df.index)
+    reasons[amount.isna()] += 'Số tiền không hợp lệ (phải là số đồng nguyên). '
+    reasons[dates.isna()] += 'Ngày không hợp lệ. '
+    errors = pd.DataFrame({'dong': df.index[rejected], 'loi': reasons[rejected].str.strip().values})
+    return clean[~rejected].astype({'so_tien': 'int64'}), errors
+
+def _normalize_text(col):
+    return col.astype(str).str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+
+def _content_keys(owner, clean):
+    # (owner, ngày, số tiền, tên, danh mục) đã chuẩn hóa
+    return (owner + '\x1f' + clean['ngay'].astype(str) + '\x1f' + clean['so_tien'].map('{:.2f}'.format)
+            + '\x1f' + _normalize_text(clean['ten']) + '\x1f' + _normalize_text(clean['danh_muc']))
+
+def _hash_key(key, occurrence):
+    return hashlib.sha1(f"{key}\x1f{occurrence}".encode()).hexdigest()
+
+def _content_hashes(owner, clean, seen=None):
+    # hash của key nội dung + thứ tự lần xuất hiện:
+    # 2 giao dịch giống hệt nhau trong cùng 1 file vẫn được giữ cả 2, nhập lại file thì cả 2 bị bỏ qua.
+    # seen: số lần mỗi key đã gặp ở các lô trước của cùng lần nhập = (digest 64-bit của key đã sort, count),
+    # không giữ chuỗi key: 16 byte mỗi key khác nhau, RAM không phình theo độ dài tên giao dịch
+    # trả về (list hash, seen đã cộng lô này)
+    key = _content_keys(owner, clean)
+    digest = pd.util.hash_pandas_object(key, index=False).to_numpy()
+    occurrence = pd.Series(digest).groupby(digest, sort=False).cumcount().to_numpy()
+    batch_keys, batch_counts = np.unique(digest, return_counts=True)
+    if seen is not None:
+        keys, counts = seen
+        pos = np.minimum(np.searchsorted(keys, digest), max(len(keys) - 1, 0))
+        if len(keys):
+            occurrence = occurrence + np.where(keys[pos] == digest, counts[pos], 0)
+        merged = np.concatenate([keys, batch_keys])
+        order = np.argsort(merged, kind='stable')
+        batch_keys, start = np.unique(merged[order], return_index=True)
+        batch_counts = np.add.reduceat(np.concatenate([counts, batch_counts])[order], start)
+    return [_hash_key(k, int(n)) for k, n in zip(key, occurrence)], (batch_keys, batch_counts)
+
+def _free_hashes(c, table_name, owner, clean):
+    # hash với lần xuất hiện đầu tiên chưa có trong DB: thêm tay 2 dòng giống nhau vẫn lưu đủ cả 2
+    hashes, taken = [], set()
+    for key in _content_keys(owner, clean):
+        occurrence = 0
+        while (_hash_key(key, occurrence) in taken or c.execute(
+                f"SELECT 1 FROM {table_name} WHERE owner=? AND content_hash=?",
+                (owner, _hash_key(key, occurrence))).fetchone()):
+            occurrence += 1
+        hashes.append(_hash_key(key, occurrence))
+        taken.add(hashes[-1])
+    return hashes
+
+def _bulk_insert(owner, batches, seen=None):
+    # batches: list (table_name, clean_df) -> ghi tất cả trong 1 transaction
+    # trả về (số dòng thêm mới, số dòng bỏ qua vì đã có)
+    # seen: dict table_name -> seen của _content_hashes, giữ qua các lô của cùng 1 file
+    seen = seen if seen is not None else {}
+    hashed = []
+    for table_name, clean in batches:
+        hashes, seen[table_name] = _content_hashes(owner, clean, seen.get(table_name))
+        hashed.append((table_name, clean.assign(content_hash=hashes)))
+    batches = hashed
+    def write(c):
+        inserted = skipped = 0
+        for table_name, clean in batches:
+            existing = set()
+            hashes = clean['content_hash'].tolist()
+            for start in range(0, len(hashes), HASH_CHUNK_SIZE):
+                chunk = hashes[start:start + HASH_CHUNK_SIZE]
+                existing.update(row[0] for row in c.execute(
+                    f"SELECT content_hash FROM {table_name} WHERE owner=? AND content_hash IN ({','.join('?' * len(chunk))})",
+                    (owner, *chunk)))
+            new = clean[~clean['content_hash'].isin(existing)]
+            skipped += len(clean) - len(new)
+            if new.empty:
+                continue
+            query = (f'INSERT OR IGNORE INTO {table_name}(owner, {NAME_COLUMNS[table_name]}, amount, category, date, content_hash) '
+                     f'VALUES (?,?,?,?,?,?)')
+            for start in range(0, len(new), BULK_CHUNK_SIZE):
+                chunk = new.iloc[start:start + BULK_CHUNK_SIZE]
+                c.executemany(query, ((owner,) + row for row in chunk.itertuples(index=False, name=None)))
+            classifier.learn(c, owner, table_name, new['ten'], new['danh_muc'])
+            inserted += len(new)
+        if inserted:
+            _bump_version(c, owner)
+        return inserted, skipped
+    return get_writer(owner).run(write)
+
+@timed('repo.add_records_bulk')
+def add_records_bulk(table_name, owner, df, seen=None):
+    # trả về (số dòng thêm mới, số dòng trùng bị bỏ qua, bảng lỗi)
+    clean, errors = prepare_records(df)
+    inserted, skipped = _bulk_insert(owner, [(table_name, clean)], seen) if not clean.empty else (0, 0)
+    return inserted, skipped, errors
+
+def add_expenses_bulk(owner, df, seen=None):
+    return add_records_bulk('expenses', owner, df, seen)
+
+def add_income_bulk(owner, df, seen=None):
+    return add_records_bulk('income', owner, df, seen)
+
+@timed('repo.add_transactions_bulk')
+def add_transactions_bulk(owner, df):
+    # chia dòng vào income/expenses theo cột loai
+    clean, errors = prepare_records(df)
+    tables = df['loai'].map(TYPE_TABLES)
+    unknown = tables.isna() & df.index.isin(clean.index)
+    if unknown.any():
+        errors = pd.concat([errors, pd.DataFrame({'dong': df.index[unknown], 'loi': 'Loại giao dịch không hợp lệ.'})],
+                           ignore_index=True).sort_values('dong', ignore_index=True)
+    tables = tables[clean.index]
+    batches = [(table_name, clean[tables == table_name]) for table_name in NAME_COLUMNS]
+    batches = [(table_name, part) for table_name, part in batches if not part.empty]
+    inserted, skipped = _bulk_insert(owner, batches) if batches else (0, 0)
+    return inserted, skipped, errors
+
+@timed('repo.add_records_from_file')
+def add_records_from_file(table_name, owner, uploaded_file, columns, on_progress=None):
+    # columns: {'ten': cột trong file, 'so_tien': ..., 'danh_muc': ..., 'ngay': ...}
+    # mỗi lô là 1 lần ghi riêng, RAM chỉ giữ 1 lô; on_progress(tiến độ 0..1, số dòng đã nhập)
+    check_table(table_name)
+    inserted, skipped, errors, seen = 0, 0, [], {}
+    for batch, done in file_import.iter_batches(uploaded_file, list(dict.fromkeys(columns.values()))):
+        n, n_skipped, batch_errors = add_records_bulk(table_name, owner, pd.DataFrame({key: batch[col] for key, col in columns.items()}), seen)
+        inserted += n
+        skipped += n_skipped
+        if not batch_errors.empty:
+            errors.append(batch_errors)
+        if on_progress:
+            on_progress(done, inserted)
+    return inserted, skipped, pd.concat(errors, ignore_index=True) if errors else pd.DataFrame({'dong': [], 'loi': []})
+
+def add_expenses_from_file(owner, uploaded_file, columns, on_progress=None):
+    return add_records_from_file('expenses', owner, uploaded_file, columns, on_progress)
+
+# export: đọc theo lô, cùng tên cột với file nhập (ten, so_tien, danh_muc, ngay) để nhập lại được
+EXPORT_CHUNK_SIZE = 50_000
+
+def iter_records(table_name, owner, chunk_size=EXPORT_CHUNK_SIZE):
+    query = (f"SELECT {NAME_COLUMNS[check_table(table_name)]} as ten, amount as so_tien, category as danh_muc, date as ngay "
+             f"FROM {table_name} WHERE owner=? ORDER BY id")
+    with get_read_pool(owner).connection() as conn:
+        yield from pd.read_sql_query(query, conn, params=(owner,), chunksize=chunk_size)
+
+# nhận diện danh mục theo lịch sử, chỉ dòng chưa biết mới gửi cho AI
+@timed('repo.classify_names')
+def classify_names(owner, names):
+    with get_read_pool(owner).connection() as conn:
+        pending = classifier.needs_training(conn, owner)
+    if pending:
+        get_writer(owner).run(classifier.train, owner, NAME_COLUMNS)
+    with get_read_pool(owner).connection() as conn:
+        return classifier.predict(conn, owner, names)
+
+@timed('repo.label_from_history')
+def label_from_history(owner, df, col_item, col_amount, col_date):
+    # trả về (kết quả cùng dạng AI trả về, kèm 'row' = index dòng gốc; các dòng còn lại cần gửi AI)
+    amount = vn_format.parse_amounts(df[col_amount])
+    dates = vn_format.parse_dates(df[col_date])
+    labels = pd.Series(classify_names(owner, df[col_item].astype(str).tolist()), index=df.index, dtype=object)
+    hit = labels.notna() & amount.notna() & dates.notna()
+    if not hit.any():
+        return [], df
+    table_types = {table_name: type_name for type_name, table_name in TYPE_TABLES.items()}
+    known = pd.DataFrame({
+        'row': df.index[hit],
+        'user': '',
+        'content': df.loc[hit, col_item].astype(str).values,
+        'amount': amount[hit].abs().values,
+        'category': labels[hit].str[1].values,
+        'date': dates[hit].dt.strftime('%Y-%m-%d').values,
+        'type': labels[hit].str[0].map(table_types).values,
+    })
+    return known.to_dict('records'), df[~hit]
+
+# chia DB 1 file có sẵn thành các shard theo SHARD_DIR/SHARD_COUNT hiện tại (chạy khi app đã dừng):
+# copy dữ liệu từng nhóm owner sang shard của nó bằng ATTACH + INSERT ... SELECT, trigger ở shard tự dựng lại
+# monthly_rollups và FTS; đếm lại số dòng từng bảng khớp rồi mới xóa khỏi DB_PATH (bảng users giữ nguyên).
+# Trước khi sửa DB_PATH có bản sao DB_PATH + '.before-shard' để quay lại nếu cần.
+SHARD_TABLES = list(NAME_COLUMNS) + ['data_versions', 'classifier_tokens', 'classifier_labels', 'classifier_pending']
+
+def _copy_to_shard(path, owners):
+    conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        migrate(conn.cursor())
+        conn.execute("COMMIT")
+        # ATTACH không chạy được trong transaction
+        conn.execute("ATTACH DATABASE ? AS src", (DB_PATH,))
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("CREATE TEMP TABLE shard_owners (owner TEXT PRIMARY KEY)")
+        conn.executemany("INSERT INTO temp.shard_owners VALUES (?)", ((owner,) for owner in owners))
+        for table_name in SHARD_TABLES:
+            columns = ', '.join(row[1] for row in conn.execute(f"PRAGMA main.table_info({table_name})"))
+            conn.execute(f"INSERT INTO main.{table_name}({columns}) SELECT {columns} FROM src.{table_name} "
+                         f"WHERE owner IN (SELECT owner FROM temp.shard_owners)")
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE src")
+    finally:
+        conn.close()
+
+def _row_counts(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {t: conn.execute(f"SELECT COUNT(*) FROM {t} WHERE owner IS NOT NULL").fetchone()[0] for t in SHARD_TABLES}
+    finally:
+        conn.close()
+
+@timed('repo.split_database')
+def split_database(on_progress=None):
+    # trả về {bảng: số dòng đã chuyển}; on_progress(số shard đã xong, tổng số shard)
+    if SHARD_DIR is None:
+        raise ValueError("Chưa đặt SHARD_DIR")
+    if SHARD_COUNT < 1:
+        raise ValueError(f"SHARD_COUNT phải >= 1, đang là {SHARD_COUNT}")
+    if glob.glob(os.path.join(SHARD_DIR, '*.db')):
+        raise RuntimeError(f"{SHARD_DIR} đã có file shard, cần thư mục trống")
+    get_writer().run(migrate)
+    if get_writer().run(_stored_layout) != 'none':
+        raise RuntimeError(f"{DB_PATH} đã được chia shard")
+    os.makedirs(SHARD_DIR, exist_ok=True)
+
+    source = sqlite3.connect(DB_PATH)
+    try:
+        backup = sqlite3.connect(DB_PATH + '.before-shard')
+        source.backup(backup)
+        backup.close()
+        owners = sorted({row[0] for t in SHARD_TABLES
+                         for row in source.execute(f"SELECT DISTINCT owner FROM {t} WHERE owner IS NOT NULL")})
+    finally:
+        source.close()
+    groups = {}
+    for owner in owners:
+        groups.setdefault(shard_path(owner), []).append(owner)
+    for done, (path, group) in enumerate(sorted(groups.items()), start=1):
+        _copy_to_shard(path, group)
+        if on_progress:
+            on_progress(done, len(groups))
+
+    expected, copied = _row_counts(DB_PATH), Counter()
+    for path in groups:
+        copied.update(_row_counts(path))
+    copied = {t: copied[t] for t in SHARD_TABLES}
+    if copied != expected:
+        raise RuntimeError(f"Số dòng trong shard không khớp: {copied} != {expected}, DB_PATH chưa bị sửa")
+
+    def clear(c):
+        for table_name in SHARD_TABLES + ['monthly_rollups']:
+            c.execute(f"DELETE FROM {table_name} WHERE owner IS NOT NULL")
+        c.execute("INSERT OR REPLACE INTO settings(key, value) VALUES ('shard_layout', ?)", (shard_layout(),))
+    get_writer().run(clear)
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, timeout=30)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return copied
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# module của app nằm ở thư mục gốc repo (chạy như script), không phải package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from money_words import read_money
+
+DIGIT_VALUES = {'không': 0, 'một': 1, 'mốt': 1, 'hai': 2, 'ba': 3, 'bốn': 4, 'tư': 4,
+                'năm': 5, 'lăm': 5, 'sáu': 6, 'bảy': 7, 'tám': 8, 'chín': 9}
+SCALES = {'nghìn': 10 ** 3, 'triệu': 10 ** 6}
+
+
+def parse_words(text):
+    # đọc ngược chữ -> số nguyên, chỉ để kiểm tra read_money
+    words = text.lower().split()
+    sign = -1 if words[:1] == ['âm'] else 1
+    total = section = triple = digit = 0
+    for word in words[1:] if sign < 0 else words:
+        if word in DIGIT_VALUES:
+            digit = DIGIT_VALUES[word]
+        elif word == 'trăm':
+            triple, digit = triple + digit * 100, 0
+        elif word == 'mươi':
+            triple, digit = triple + digit * 10, 0
+        elif word == 'mười':
+            triple += 10
+        elif word in SCALES:
+            section, triple, digit = section + (triple + digit) * SCALES[word], 0, 0
+        elif word == 'tỷ':
+            total, section, triple, digit = (total + section + triple + digit) * 10 ** 9, 0, 0, 0
+        elif word != 'lẻ':
+            raise ValueError(word)
+    return sign * (total + section + triple + digit)
+
+
+@pytest.mark.parametrize('amount, expected', [
+    (105, 'Một trăm lẻ năm'),
+    (21, 'Hai mươi mốt'),
+    (24, 'Hai mươi tư'),
+    (15, 'Mười lăm'),
+    (1_000_005, 'Một triệu không trăm lẻ năm'),
+    (2_000_000_021, 'Hai tỷ không trăm hai mươi mốt'),
+])
+def test_read_money_cases(amount, expected):
+    assert read_money(amount) == expected
+
+
+def test_read_money_round_trip():
+    rng = random.Random(0)
+    amounts = [0, 10, 1000, 10 ** 9, 10 ** 12] + [rng.randrange(10 ** rng.randrange(1, 16)) for _ in range(3000)]
+    for amount in amounts + [-a for a in amounts[:200] if a]:
+        assert parse_words(read_money(amount)) == amount, read_money(amount)
@@ -0,0 +1,15 @@
+import sqlite3
+
+import repository
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    # DB mới chạy hết migration: mọi query trong HOT_QUERIES phải đi index, không full scan
+    conn = sqlite3.connect(tmp_path / 'test.db')
+    try:
+        c = conn.cursor()
+        repository.migrate(c)
+        conn.commit()
+        assert repository.check_query_plans(conn) == []
+    finally:
+        conn.close()
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+import repository
+import vn_format
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1.234.567 đ', 1234567),
+    ('-50,000 VND', -50000),
+    ('(120.000)', -120000),
+    ('1 234 567', 1234567),
+    ('1.234.567,00', 1234567),
+    ('1,234,567.00', 1234567),
+    ('₫ 45.000', 45000),
+    ('50000', 50000),
+    ('12,5', None),
+    ('1.2.3', None),
+    ('abc', None),
+    ('', None),
+])
+def test_parse_amounts(text, expected):
+    result = vn_format.parse_amounts(pd.Series([text], dtype=object))
+    assert str(result.dtype) == 'Int64'
+    assert (None if pd.isna(result[0]) else result[0]) == expected
+
+
+def test_parse_amounts_numeric_column():
+    result = vn_format.parse_amounts(pd.Series([1000.0, -250.0, 12.5]))
+    assert result.tolist()[:2] == [1000, -250] and pd.isna(result[2])
+
+
+@pytest.mark.parametrize('values, expected', [
+    (['02/01/2024', '31/12/2023'], ['2024-01-02', '2023-12-31']),
+    (['2024-01-02', '2023-12-31'], ['2024-01-02', '2023-12-31']),
+    (['02-01-2024', '31-12-2023'], ['2024-01-02', '2023-12-31']),
+    (['02.01.2024', '31.12.2023'], ['2024-01-02', '2023-12-31']),
+    (['02/01/2024 10:15', '31/12/2023 08:00'], ['2024-01-02', '2023-12-31']),
+    # định dạng theo cả cột, dòng lệch parse lại riêng
+    (['02/01/2024', '2023-12-31'], ['2024-01-02', '2023-12-31']),
+    (['02/01/2024', 'không phải ngày'], ['2024-01-02', None]),
+])
+def test_parse_dates(values, expected):
+    result = vn_format.parse_dates(pd.Series(values))
+    assert str(result.dtype) == 'datetime64[ns]'
+    assert [None if pd.isna(d) else d.strftime('%Y-%m-%d') for d in result] == expected
+
+
+@pytest.mark.parametrize('values', [
+    ['2024-01-02T10:00:00+07:00'] * 3,
+    ['02/01/2024', '03/01/2024', '2024-01-05T10:00:00Z'],
+])
+def test_parse_dates_with_timezone(values):
+    # ISO có múi giờ -> đổi về UTC, bỏ múi giờ; prepare_records không được lỗi .dt
+    result = vn_format.parse_dates(pd.Series(values))
+    assert str(result.dtype) == 'datetime64[ns]' and result.notna().all()
+    df = pd.DataFrame({'ten': 'Phở', 'so_tien': '50.000 đ', 'danh_muc': 'Ăn uống', 'ngay': values})
+    clean, errors = repository.prepare_records(df)
+    assert len(clean) == len(values) and errors.empty
+    assert clean['ngay'].iloc[0] == result.iloc[0].strftime('%Y-%m-%d')
+
+
+def test_parse_amounts_mixed_object_column():
+    # ô số của xlsx giữ kiểu số: 1.234 là số lẻ (không hợp lệ), không phải "1.234" = 1234 đồng
+    col = pd.Series([1.234, 50000, '1.234.000 đ', 1500.0, None, True], dtype=object)
+    assert vn_format.parse_amounts(col).tolist() == [pd.NA, 50000, 1234000, 1500, pd.NA, pd.NA]
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+# Chuẩn hóa số tiền/ngày theo kiểu sao kê ngân hàng VN, chạy trên cả cột (không lặp từng dòng):
+# - số tiền: "1.234.567 đ", "-50,000 VND", "(120.000)", "1 234 567", "1.234.567,00" -> Int64 có dấu (<NA> nếu không đọc được)
+#   dấu '.'/',' xuất hiện nhiều lần hoặc đứng trước đúng 3 chữ số là phân cách hàng nghìn, còn lại là dấu thập phân;
+#   VND không có đơn vị lẻ nên phần thập phân khác 0 ("12,5") bị coi là không hợp lệ
+# - ngày: đoán định dạng 1 lần cho cả cột từ vài trăm dòng đầu (ưu tiên dd/mm/yyyy), dòng lệch mới parse lại riêng;
+#   kết quả luôn là datetime64[ns] không múi giờ (ISO có "+07:00"/"Z" được đổi về UTC)
+DATE_FORMATS = [
+    '%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%Y/%m/%d',
+    '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%Y%m%d', '%m/%d/%Y',
+]
+DATE_SAMPLE_SIZE = 200
+CURRENCY = r'(?i)^(?:vn[dđ]|₫)\s*|\s*(?:vn[dđ]|đồng|đ|₫|d)\.?$'
+
+
+def parse_amounts(col):
+    if pd.api.types.is_numeric_dtype(col):
+        return _whole(col.astype(float))
+    if pd.api.types.infer_dtype(col, skipna=True) not in ('string', 'empty'):
+        # cột object lẫn số và chuỗi (ô số của xlsx): số đi thẳng vào _whole, không qua luật dấu phân cách
+        is_number = col.map(_is_number).to_numpy(dtype=bool)
+        amounts = _parse_text(col.where(~is_number))
+        amounts[is_number] = _whole(col[is_number].astype(float))
+        return amounts
+    return _parse_text(col)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+
+def _parse_text(col):
+    # chuỗi Arrow: các phép str/regex chạy trong pyarrow.compute, nhanh hơn nhiều so với object
+    text = col.astype('string[pyarrow]').str.strip()
+    negative = text.str.contains(r'^\(.*\)$|^[-−]|[-−]$').to_numpy(dtype=bool, na_value=False)
+    text = (text.str.replace(CURRENCY, '', regex=True)
+                .str.strip('()+-−  ')
+                .str.replace(r'[\s ]', '', regex=True))
+    valid = text.str.fullmatch(r'\d[\d.,]*').to_numpy(dtype=bool, na_value=False)
+
+    dots = text.str.count(r'\.').to_numpy(dtype=int, na_value=0)
+    commas = text.str.count(',').to_numpy(dtype=int, na_value=0)
+    last_dot = text.str.rfind('.').to_numpy(dtype=int, na_value=-1)
+    last_comma = text.str.rfind(',').to_numpy(dtype=int, na_value=-1)
+    after_last = text.str.len().to_numpy(dtype=int, na_value=0) - np.maximum(last_dot, last_comma) - 1
+    both = (dots > 0) & (commas > 0)
+    decimal_comma = valid & ((both & (last_comma > last_dot)) | ((dots == 0) & (commas == 1) & (after_last != 3)))
+    decimal_dot = valid & ((both & (last_dot > last_comma)) | ((commas == 0) & (dots == 1) & (after_last != 3)))
+
+    # chỉ xử lý chuỗi cho phần có dấu phân cách, phần chỉ có chữ số đi thẳng vào to_numeric
+    has_sep = valid & ((dots > 0) | (commas > 0))
+    thousands = has_sep & ~decimal_comma & ~decimal_dot
+    # phân cách hàng nghìn phải chia đúng nhóm 3 chữ số ("1.2.3" là lỗi)
+    valid &= ~thousands | text.str.fullmatch(r'\d{1,3}(?:[.,]\d{3})+').to_numpy(dtype=bool, na_value=False)
+    thousands &= valid
+    number = text.where(valid)
+    number[thousands] = text[thousands].str.replace(r'[.,]', '', regex=True)
+    number[decimal_comma] = text[decimal_comma].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    number[decimal_dot] = text[decimal_dot].str.replace(',', '', regex=False)
+    amounts = pd.to_numeric(number, errors='coerce').astype(float)
+    amounts[negative] = -amounts[negative]
+    return _whole(amounts)
+
+
+def _whole(amounts):
+    # chỉ giữ số nguyên đồng, còn lại -> <NA>
+    values = amounts.to_numpy(dtype=float)
+    return amounts.where(np.isfinite(values) & (values == np.round(values))).astype('Int64')
+
+
+def detect_date_format(text):
+    # định dạng parse được nhiều dòng mẫu nhất; hòa thì lấy định dạng đứng trước trong DATE_FORMATS
+    sample = text.dropna().head(DATE_SAMPLE_SIZE)
+    if sample.empty:
+        return None
+    scores = [pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum() for fmt in DATE_FORMATS]
+    best = int(np.argmax(scores))
+    return DATE_FORMATS[best] if scores[best] else None
+
+
+def _naive(dates):
+    # ngày có múi giờ ("...+07:00", "...Z") -> đổi về UTC rồi bỏ múi giờ, cột luôn là datetime64[ns] không tz
+    return dates.dt.tz_convert(None) if dates.dt.tz is not None else dates
+
+
+def parse_dates(col):
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return _naive(col)
+    text = col.astype('string').str.strip().replace('', pd.NA)
+    fmt = detect_date_format(text)
+    dates = pd.to_datetime(text, format=fmt, errors='coerce') if fmt else pd.Series(pd.NaT, index=col.index)
+    retry = dates.isna() & text.notna()
+    if retry.any():
+        dates[retry] = _naive(pd.to_datetime(text[retry], errors='coerce', format='mixed', dayfirst=True, utc=True))
+    return dates.astype('datetime64[ns]')
+
+
+def normalize(df, amount_col='so_tien', date_col='ngay'):
+    # trả về (frame với cột số tiền/ngày đã parse, mask dòng bị loại)
+    frame = df.assign(**{amount_col: parse_amounts(df[amount_col]), date_col: parse_dates(df[date_col])})
+    rejected = frame[amount_col].isna() | frame[date_col].isna()
+    return frame, rejected